@@ -0,0 +1,126 @@
+"""
+Storage benchmark: 16-bit PCM WAV vs lossless FLAC (--audio-format flac).
+
+For every sample it reports the on-disk size of both formats and times
+- encode: PCM -> .flac file (write_audio), as the backends and the dialogue assembler do
+- decode: .wav / .flac file -> PCM (read_pcm), as QC, augmentation and dialogue assembly do
+- duration: the manifest's header reads (tts_common.utils_manifest) (wave header vs FLAC STREAMINFO) against a full decode
+
+Point --input-dir at a real output directory (e.g. tts_outputs) for numbers on our dataset. Without
+it, samples come from the offline tone backend with a -30 dBFS noise floor added (pure tones would
+compress unrealistically well); the synthetic size ratio mostly reflects that noise floor, so only
+--input-dir numbers describe our data.
+
+Needs soundfile (pip install soundfile), the codec write_audio / read_pcm use for FLAC.
+
+Usage:
+    python benchmarks/bench_flac.py
+    python benchmarks/bench_flac.py --input-dir clean_sample_generation/tts_outputs --limit 2000 --output flac.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+from tts_common.utils_manifest import get_flac_duration_seconds, get_wav_duration_seconds
+from tts_common.utils_backends import ToneBackend, read_pcm, write_audio
+
+WORDS = ['the', 'quick', 'brown', 'fox', 'jumps', 'over', 'a', 'lazy', 'dog', 'while', 'seven', 'voices', 'count', 'slowly']
+VOICES = ['en-US-AvaMultilingualNeural', 'en-US-AndrewMultilingualNeural', 'en-GB-SoniaNeural', 'en-AU-NatashaNeural']
+
+
+def synthetic_pcm(n, seed=0):
+    """n tone-backend utterances of 4-14 words, with a noise floor 30 dB below full scale."""
+    import numpy as np
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+    backend = ToneBackend()
+    for i in range(n):
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))
+        x = np.frombuffer(backend.pcm(text, rng.choice(VOICES)), dtype=np.int16).astype(np.float64)
+        x += noise.standard_normal(len(x)) * 32768 * 10 ** (-30 / 20)
+        yield f'sample_{i}', np.clip(x, -32768, 32767).astype(np.int16).tobytes()
+
+
+def dataset_pcm(input_dir, limit):
+    paths = sorted(os.path.join(root, name) for root, _, names in os.walk(input_dir) for name in names if name.endswith('.wav'))
+    for path in paths[:limit]:
+        yield os.path.splitext(os.path.relpath(path, input_dir))[0].replace(os.sep, '__'), read_pcm(path)
+
+
+def timed(fn, paths):
+    start = time.perf_counter()
+    for path in paths:
+        fn(path)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare WAV and FLAC storage size and read/write throughput.')
+    parser.add_argument('--input-dir', default=None, help='Benchmark the .wav files under this directory instead of synthetic samples')
+    parser.add_argument('--n', type=int, default=500, help='Synthetic samples to generate')
+    parser.add_argument('--limit', type=int, default=None, help='With --input-dir: at most this many files')
+    parser.add_argument('--output', default=None, help='Write the results as JSON here')
+    args = parser.parse_args()
+
+    try:
+        import soundfile  # noqa: F401
+    except ImportError:
+        sys.exit('bench_flac.py needs soundfile: pip install soundfile')
+
+    workspace = tempfile.mkdtemp(prefix='bench_flac_')
+    try:
+        samples = dataset_pcm(args.input_dir, args.limit) if args.input_dir else synthetic_pcm(args.n)
+        wavs, flacs, pcm_bytes, seconds, encode_s = [], [], 0, 0.0, 0.0
+        for name, pcm in samples:
+            wav, flac = os.path.join(workspace, f'{name}.wav'), os.path.join(workspace, f'{name}.flac')
+            write_audio(wav, pcm)
+            start = time.perf_counter()
+            write_audio(flac, pcm)
+            encode_s += time.perf_counter() - start
+            wavs.append(wav)
+            flacs.append(flac)
+            pcm_bytes += len(pcm)
+            seconds += len(pcm) / 32000
+        if not wavs:
+            sys.exit('no samples')
+
+        wav_size = sum(os.path.getsize(p) for p in wavs)
+        flac_size = sum(os.path.getsize(p) for p in flacs)
+        results = {
+            'samples': len(wavs),
+            'audio_hours': seconds / 3600,
+            'wav_mb': wav_size / 1024 ** 2,
+            'flac_mb': flac_size / 1024 ** 2,
+            'flac_ratio': flac_size / wav_size,
+            'encode_mb_per_s': pcm_bytes / encode_s / 1024 ** 2,
+            'decode_wav_mb_per_s': pcm_bytes / timed(read_pcm, wavs) / 1024 ** 2,
+            'decode_flac_mb_per_s': pcm_bytes / timed(read_pcm, flacs) / 1024 ** 2,
+            'duration_wav_header_us': timed(get_wav_duration_seconds, wavs) / len(wavs) * 1e6,
+            'duration_flac_streaminfo_us': timed(get_flac_duration_seconds, flacs) / len(flacs) * 1e6,
+            'duration_flac_decode_us': timed(read_pcm, flacs) / len(flacs) * 1e6,
+        }
+        mismatched = sum(abs(get_flac_duration_seconds(f) - get_wav_duration_seconds(w)) > 1e-6 for w, f in zip(wavs, flacs))
+        lossless = all(read_pcm(w) == read_pcm(f) for w, f in zip(wavs, flacs))
+
+        print(f'{results["samples"]} samples, {results["audio_hours"]:.2f} h of audio')
+        print(f'size      WAV {results["wav_mb"]:.1f} MB  FLAC {results["flac_mb"]:.1f} MB  ({results["flac_ratio"]:.1%} of WAV)')
+        print(f'encode    FLAC {results["encode_mb_per_s"]:.0f} MB/s of PCM')
+        print(f'decode    WAV {results["decode_wav_mb_per_s"]:.0f} MB/s  FLAC {results["decode_flac_mb_per_s"]:.0f} MB/s')
+        print(f'duration  WAV header {results["duration_wav_header_us"]:.0f} us  FLAC STREAMINFO {results["duration_flac_streaminfo_us"]:.0f} us  '
+              f'FLAC full decode {results["duration_flac_decode_us"]:.0f} us per file')
+        print(f'lossless: {lossless}, STREAMINFO duration mismatches: {mismatched}')
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f'wrote {args.output}')
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,237 @@
+"""
+Offline throughput benchmark for the generation scripts against mock providers.
+
+Each mode runs in its own subprocess, inside a fresh temporary workspace holding copies of the
+prompt and voice-list inputs, with the OpenAI / ElevenLabs clients pointed at a local
+MockProviderServer and the Azure synthesizer replaced by MockAzureSynthesizer. Nothing touches
+the real APIs and no API keys are needed.
+
+Reported per mode: samples produced, wall time, samples/sec, p50/p99 per-sample latency
+(time between consecutive completed samples) and CPU time of the generation process.
+
+Usage:
+    python benchmarks/bench_generation.py                         # all modes, realistic latencies
+    python benchmarks/bench_generation.py --modes clean_ssml clean_counting --n 40 --time-scale 0.1
+    python benchmarks/bench_generation.py --throttle-rate 0.1 --azure-p50 0.5 --azure-p99 2 --output baseline.json
+    python benchmarks/bench_generation.py --offline                # TTS modes on the local tone backend: pipeline overhead only
+    python benchmarks/bench_generation.py --modes clean_ssml --n 200 --capacity 6 --max-concurrency 32   # AIMD against a 6-request limit
+    python benchmarks/bench_generation.py --modes clean_ssml --n 200 --capacity 4 --keys 3              # three Azure regions of 4 requests each
+"""
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+CLEAN_DIR = os.path.join(REPO_ROOT, 'clean_sample_generation')
+HALLUCINATED_DIR = os.path.join(REPO_ROOT, 'hallucinated_sample_generation', 'generation')
+
+sys.path.insert(0, BENCH_DIR)
+from mock_providers import DEFAULT_PROFILES, MockAzureSynthesizer, MockProviderServer, ProviderProfile
+
+RESULT_PREFIX = 'BENCH_RESULT '
+
+CLEAN_INPUTS = ['prompts_clean', 'azure_voices_en.txt']
+HALLUCINATED_INPUTS = ['tts_prompts_base.json', 'azure_voices_en.txt']
+
+
+def _tts(module, task):
+    def run(mod, out, n):
+        engine = importlib.import_module('tts_common.tts_engine')
+        engine.run_task(mod.PIPELINE, task, out, n)
+    return {'dir': CLEAN_DIR if module.endswith('_clean') else HALLUCINATED_DIR, 'module': module, 'run': run, 'count': 'log_completion'}
+
+
+def _gpt(src_dir, chat_kind, prompt_task, extend):
+    def run(mod, out, n):
+        inputs = os.path.join('prompts_clean', f'{prompt_task}.json') if src_dir == CLEAN_DIR else 'tts_prompts_base.json'
+        with open(inputs, 'r', encoding='utf-8') as f:
+            prompts = json.load(f)
+        before = count_prompt_entries(prompts)
+        extend(mod, n, prompts)
+        return count_prompt_entries(prompts) - before
+    return {'dir': src_dir, 'module': 'gpt_prompt_generation', 'run': run, 'count': 'query', 'chat_kind': chat_kind}
+
+
+def count_prompt_entries(prompts):
+    return sum(len(v) if isinstance(v, list) else 1 for task in prompts.values() for v in task.values())
+
+
+MODES = {
+    'clean_ssml': _tts('tts_generation_clean', 'pause'),
+    'clean_counting': _tts('tts_generation_clean', 'counting'),
+    'clean_identity': _tts('tts_generation_clean', 'identity'),
+    'hallucinated_elevenlabs': _tts('tts_generation', 'age'),
+    'hallucinated_openai': _tts('tts_generation', 'volume'),
+    'hallucinated_intonation': _tts('tts_generation', 'intonation'),
+    'hallucinated_ssml': _tts('tts_generation', 'pause'),
+    'hallucinated_counting': _tts('tts_generation', 'counting'),
+    'hallucinated_identity': _tts('tts_generation', 'identity'),
+    'gpt_clean_pause': _gpt(CLEAN_DIR, 'pauses', 'pause', lambda m, n, p: m.extend_ssml_task('pause', n, p)),
+    'gpt_clean_counting': _gpt(CLEAN_DIR, 'dialogues', 'counting', lambda m, n, p: m.extend_counting_task(n, p)),
+    'gpt_clean_identity': _gpt(CLEAN_DIR, 'dialogues', 'identity', lambda m, n, p: m.extend_identity_task(n, p)),
+    'gpt_hallucinated_age': _gpt(HALLUCINATED_DIR, 'scripts', 'age', lambda m, n, p: m.extend_general_task('age', n, p)),
+    'gpt_hallucinated_identity': _gpt(HALLUCINATED_DIR, 'identity_scripts', 'identity', lambda m, n, p: m.extend_identity_task(n, p)),
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def run_worker(args):
+    """Runs one mode inside a temporary workspace; prints a JSON result line."""
+    mode = MODES[args.worker]
+    src_dir = mode['dir']
+    workspace = tempfile.mkdtemp(prefix=f'bench_{args.worker}_')
+    for name in (CLEAN_INPUTS if src_dir == CLEAN_DIR else HALLUCINATED_INPUTS):
+        src = os.path.join(src_dir, name)
+        (shutil.copytree if os.path.isdir(src) else shutil.copy)(src, os.path.join(workspace, name))
+
+    os.chdir(workspace)
+    sys.path.insert(0, src_dir)
+    chat_kind = mode.get('chat_kind', 'scripts')
+    keys = ','.join(f'mock{i}' for i in range(args.keys))
+    os.environ.update({
+        'OPENAI_API_KEY': keys, 'ELEVENLABS_API_KEY': keys,
+        'AZURE_API_KEY': keys, 'AZURE_API_REGION': ','.join(f'region{i}' for i in range(args.keys)),
+        'OPENAI_BASE_URL': f'{args.mock_url}/chat/{chat_kind}/v1' if mode['count'] == 'query' else f'{args.mock_url}/v1',
+        'LOG_LEVEL': 'WARNING',
+    })
+
+    script = importlib.import_module(mode['module'])
+    # the TTS scripts are task registries over tts_engine, which holds the clients and the ledger writer
+    mod = importlib.import_module('tts_common.tts_engine') if mode['count'] == 'log_completion' else script
+    mod.setup_logger(f'bench_{args.worker}')
+    if hasattr(mod, 'get_eleven_client'):
+        from elevenlabs.client import ElevenLabs
+        for credential in mod.CREDENTIALS.credentials('elevenlabs'):
+            credential.client = ElevenLabs(api_key=credential.key, base_url=args.mock_url)
+    if args.offline and hasattr(mod, 'offline'):
+        mod.offline = True
+    if hasattr(mod, 'max_concurrency'):
+        mod.max_concurrency = args.max_concurrency
+        mod.CONCURRENCY.configure(args.max_concurrency)
+    if hasattr(mod, 'get_azure_synthesizer'):
+        # one mock per key (region), shared by the job threads
+        profile = ProviderProfile(args.azure_p50, args.azure_p99, args.throttle_rate, args.capacity)
+        synthesizers = {c.name: MockAzureSynthesizer(profile, time_scale=args.time_scale, seed=i) for i, c in enumerate(mod.CREDENTIALS.credentials('azure'))}
+        mod.get_azure_synthesizer = lambda: synthesizers[mod.CREDENTIALS.current('azure').name]
+
+    stamps = []
+    counted = getattr(mod, mode['count'])
+    def counting(*a, **kw):
+        result = counted(*a, **kw)
+        stamps.append(time.perf_counter())
+        return result
+    setattr(mod, mode['count'], counting)
+
+    out = os.path.join(workspace, 'outputs')
+    os.makedirs(out, exist_ok=True)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    produced = mode['run'](script, out, args.n)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = [b - a for a, b in zip([wall_start] + stamps[:-1], stamps)]
+    samples = produced if produced is not None else len(stamps)
+    result = {
+        'mode': args.worker,
+        'samples': samples,
+        'requests': len(stamps) if mode['count'] == 'query' else None,
+        'wall_s': round(wall, 3),
+        'samples_per_s': round(samples / wall, 3) if wall else None,
+        'p50_sample_s': percentile(latencies, 0.5),
+        'p99_sample_s': percentile(latencies, 0.99),
+        'cpu_s': round(cpu, 3),
+        # final AIMD window per provider (TTS modes)
+        'windows': {k.split('"')[1]: v for k, v in mod.METRICS.snapshot()['gauges'].items() if k.startswith('concurrency_window')} if hasattr(mod, 'CONCURRENCY') else None,
+        # API keys taken out of rotation after repeated throttles / failures
+        'drains': sum(v for k, v in mod.METRICS.snapshot()['counters'].items() if k.startswith('credential_drains_total')) if hasattr(mod, 'CONCURRENCY') else None,
+    }
+    sys.__stdout__.write(RESULT_PREFIX + json.dumps(result) + '\n')
+    sys.__stdout__.flush()
+    shutil.rmtree(workspace, ignore_errors=True)
+
+
+def run_all(args):
+    profiles = {
+        'openai': ProviderProfile(args.openai_p50, args.openai_p99, args.throttle_rate, args.capacity),
+        'elevenlabs': ProviderProfile(args.elevenlabs_p50, args.elevenlabs_p99, args.throttle_rate, args.capacity),
+        'chat': ProviderProfile(args.chat_p50, args.chat_p99, args.throttle_rate),
+    }
+    server = MockProviderServer(profiles=profiles, time_scale=args.time_scale).start()
+    print(f'mock providers at {server.url}')
+
+    results = []
+    for mode in args.modes:
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', mode, '--mock-url', server.url] + worker_args(args)
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)]
+        if proc.returncode != 0 or not lines:
+            print(f'{mode}: FAILED (exit {proc.returncode})\n{proc.stderr[-2000:]}')
+            continue
+        result = json.loads(lines[-1][len(RESULT_PREFIX):])
+        results.append(result)
+        print_row(result)
+    server.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=4)
+        print(f'wrote {args.output}')
+    return results
+
+
+def worker_args(args):
+    keys = ['n', 'time_scale', 'throttle_rate', 'capacity', 'max_concurrency', 'keys', 'azure_p50', 'azure_p99']
+    return [a for k in keys for a in (f'--{k.replace("_", "-")}', str(getattr(args, k)))] + (['--offline'] if args.offline else [])
+
+
+def fmt(v, spec='.3f'):
+    return '-' if v is None else format(v, spec)
+
+
+def print_row(r):
+    print(f"{r['mode']:<26} {r['samples']:>7} {fmt(r['wall_s']):>9} {fmt(r['samples_per_s']):>9} "
+          f"{fmt(r['p50_sample_s']):>9} {fmt(r['p99_sample_s']):>9} {fmt(r['cpu_s']):>8}"
+          + (f"  window {r['windows']}" if r.get('windows') else '')
+          + (f"  drains {r['drains']}" if r.get('drains') else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark generation modes against local mock providers.')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--n', type=int, default=20, help='Target samples per TTS mode / n passed to GPT modes')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='Multiply every sampled latency (e.g. 0.1 for quick runs)')
+    parser.add_argument('--throttle-rate', type=float, default=0.02, help='Fraction of requests answered with a throttling error')
+    parser.add_argument('--capacity', type=int, default=0, help='Requests each TTS provider serves at once; more are throttled (0: unlimited)')
+    parser.add_argument('--max-concurrency', type=int, default=16, help='--max-concurrency of the TTS engine')
+    parser.add_argument('--keys', type=int, default=1, help='API keys (Azure regions) per provider, each with its own --capacity')
+    for provider, profile in DEFAULT_PROFILES.items():
+        parser.add_argument(f'--{provider}-p50', type=float, default=profile.p50)
+        parser.add_argument(f'--{provider}-p99', type=float, default=profile.p99)
+    parser.add_argument('--offline', action='store_true', help='Run TTS modes on the local tone backend instead of the mock providers')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON (baseline file)')
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--mock-url', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+    else:
+        print(f"{'mode':<26} {'samples':>7} {'wall_s':>9} {'smp/s':>9} {'p50_s':>9} {'p99_s':>9} {'cpu_s':>8}")
+        run_all(args)
@@ -0,0 +1,130 @@
+"""
+Read-throughput benchmark: loose WAV files vs packed WebDataset shards (pack_shards.py).
+
+Builds a synthetic set of short 16 kHz WAVs with MCQ items in a temporary directory, packs them,
+then times three ways of reading every sample's audio and metadata:
+- loose: open and read each WAV, metadata from the MCQ list (what loaders do today)
+- stream: iter_samples() over the shards, sequentially
+- index: ShardIndex.get() for every key in random order
+
+Files are read right after being written, so all three mostly hit the page cache; on a network
+filesystem such as /wekafs the per-file open cost the shards avoid is much larger than here.
+Run it against a real output directory with --audio-root / --input to measure that instead.
+
+Usage:
+    python benchmarks/bench_shards.py
+    python benchmarks/bench_shards.py --n 20000 --seconds 4 --shard-size-mb 64
+    python benchmarks/bench_shards.py --input output_mcq.json --audio-root /wekafs/.../speech_benchmark_samples
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import wave
+from array import array
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'hallucinated_sample_generation', 'generation'))
+from create_manifest import load_items, resolve_audio_path
+from pack_shards import ShardIndex, iter_samples, pack
+
+SAMPLE_RATE = 16000
+
+
+def make_dataset(root, n, seconds):
+    """n tone WAVs under root/<task>/ and their MCQ-like items."""
+    tone = array('h', (int(3000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(int(seconds * SAMPLE_RATE)))).tobytes()
+    items = []
+    for i in range(n):
+        task = ('pause', 'prolong', 'counting', 'identity')[i % 4]
+        rel = os.path.join(task, f'{task}_{i}.wav')
+        os.makedirs(os.path.join(root, task), exist_ok=True)
+        with wave.open(os.path.join(root, rel), 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(tone)
+        items.append({'id': f'{task}__{task}_{i}', 'task_name': task, 'audio_path': rel, 'question': 'Which word is followed by a pause?',
+                      'choice_a': 'one', 'choice_b': 'two', 'choice_c': 'three', 'choice_d': 'four', 'answer_gt': 'one'})
+    return items
+
+
+def timed(name, fn):
+    start = time.perf_counter()
+    count, nbytes = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{name:<8} {count:>8} {elapsed:>9.3f} {count / elapsed:>11.0f} {nbytes / elapsed / 1024 ** 2:>9.1f}')
+    return {'samples': count, 'seconds': elapsed, 'samples_per_s': count / elapsed, 'mb_per_s': nbytes / elapsed / 1024 ** 2}
+
+
+def read_loose(items, audio_root):
+    nbytes = 0
+    for item in items:
+        with open(resolve_audio_path(item['audio_path'], audio_root), 'rb') as f:
+            nbytes += len(f.read())
+        nbytes += len(json.dumps(item))
+    return len(items), nbytes
+
+
+def read_stream(shard_paths):
+    count = nbytes = 0
+    for sample in iter_samples(shard_paths):
+        count += 1
+        nbytes += len(sample['wav']) + len(json.dumps(sample['json']))
+    return count, nbytes
+
+
+def read_index(index, seed=0):
+    keys = index.keys()
+    random.Random(seed).shuffle(keys)
+    nbytes = 0
+    for key in keys:
+        sample = index.get(key)
+        nbytes += len(sample['wav']) + len(json.dumps(sample['json']))
+    return len(keys), nbytes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare reading loose WAVs with reading packed shards.')
+    parser.add_argument('--n', type=int, default=5000, help='Synthetic samples to generate')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Length of each synthetic sample')
+    parser.add_argument('--shard-size-mb', type=float, default=128)
+    parser.add_argument('--input', default=None, help='Benchmark a real MCQ file instead of synthetic data')
+    parser.add_argument('--audio-root', default=None, help='With --input: directory audio_path is relative to')
+    parser.add_argument('--output', default=None, help='Write the results as JSON here')
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix='bench_shards_')
+    try:
+        if args.input:
+            items, audio_root = load_items(args.input), args.audio_root
+        else:
+            audio_root = os.path.join(workspace, 'loose')
+            items = make_dataset(audio_root, args.n, args.seconds)
+        shard_dir = os.path.join(workspace, 'shards')
+        start = time.perf_counter()
+        writer = pack(items, audio_root, shard_dir, args.shard_size_mb)
+        print(f'packing took {time.perf_counter() - start:.2f}s\n')
+
+        print(f'{"mode":<8} {"samples":>8} {"wall_s":>9} {"samples/s":>11} {"MB/s":>9}')
+        index = ShardIndex(shard_dir)
+        results = {
+            'loose': timed('loose', lambda: read_loose(items, audio_root)),
+            'stream': timed('stream', lambda: read_stream(index.shards)),
+            'index': timed('index', lambda: read_index(index)),
+        }
+        index.close()
+        results['shards'] = len(writer.shards)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f'wrote {args.output}')
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,84 @@
+"""
+Checks that augmented variants become MCQs of their own, and only where they keep the label true.
+
+In a temporary copy of the hallucinated pipeline each case generates --n samples of a task with
+the offline tone backend, adds the variants with --augment, and runs post_processing_mcqs.py over
+the ledger. N sources (the ledger's records without an augmentation) with K variants, E of them
+excluded for the task, must give N x (K - E + 1) MCQs, one per audio file: the originals must not be
+deduplicated away by their variants (which share task/subtask/index/voice), and no file of an
+excluded variant may be written (e.g. reverb on pause, whose tail fills the labelled silence).
+
+Usage:
+    python benchmarks/check_augment_mcqs.py                 # every case in CASES
+    python benchmarks/check_augment_mcqs.py --task pause --n 5 --variants noise_snr10 telephone gain_-6db
+    python benchmarks/check_augment_mcqs.py --task stress --variants noise_snr20 reverb_large --excluded reverb_large
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+PIPELINE_DIR = os.path.join('hallucinated_sample_generation', 'generation')
+IGNORE = shutil.ignore_patterns('__pycache__', 'logs', 'tmp', 'tts_outputs*', 'tts_log*.jsonl')
+
+# (task, variants, variants that must not be applied to the task)
+CASES = [
+    ('pause', ['noise_snr20', 'telephone'], []),
+    ('pause', ['noise_snr20', 'reverb_small', 'reverb_large'], ['reverb_small', 'reverb_large']),
+    ('prolong', ['noise_snr20', 'reverb_small', 'reverb_large'], ['reverb_large']),
+    ('stress', ['noise_snr20', 'reverb_large'], ['reverb_large']),
+]
+
+
+def run(cmd, cwd):
+    proc = subprocess.run([sys.executable] + cmd, cwd=cwd, capture_output=True, text=True, env=dict(os.environ, LOG_LEVEL='WARNING'))
+    if proc.returncode != 0:
+        raise RuntimeError(f'{" ".join(cmd)} failed:\n{proc.stdout[-2000:]}{proc.stderr[-2000:]}')
+
+
+def check(task, n, variants, excluded=()):
+    workspace = tempfile.mkdtemp(prefix='augment_mcqs_')
+    try:
+        # the pipeline imports tts_common from two directories up, so both keep their place in the tree
+        cwd = os.path.join(workspace, PIPELINE_DIR)
+        shutil.copytree(os.path.join(REPO_ROOT, PIPELINE_DIR), cwd, ignore=IGNORE)
+        shutil.copytree(os.path.join(REPO_ROOT, 'tts_common'), os.path.join(workspace, 'tts_common'), ignore=IGNORE)
+        run(['tts_generation.py', '--offline', '--tasks', task, '--n', str(n)], cwd)
+        run(['tts_generation.py', '--tasks', task, '--augment'] + variants, cwd)
+        run(['post_processing_mcqs.py', '--input', 'tts_log.jsonl', '--output', 'output_mcq.json'], cwd)
+        with open(os.path.join(cwd, 'tts_log.jsonl'), 'r', encoding='utf-8') as f:
+            sources = sum(1 for line in f if line.strip() and not json.loads(line).get('augment'))
+        with open(os.path.join(cwd, 'output_mcq.json'), 'r', encoding='utf-8') as f:
+            mcqs = json.load(f)
+        written = [name for _, _, names in os.walk(cwd) for name in names if any(name.endswith(f'__{v}.wav') for v in excluded)]
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    expected = sources * (len(variants) - len(excluded) + 1)
+    files = {m['audio_path'] for m in mcqs}
+    originals = [p for p in files if not any(p.endswith(f'__{v}.wav') for v in variants)]
+    ok = sources > 0 and len(mcqs) == expected and len(files) == expected and len(originals) == sources and not written
+    print(f'[augment] {task}: {sources} sources x {len(variants)} variants ({len(excluded)} excluded) -> {len(mcqs)} MCQs on '
+          f'{len(files)} files ({len(originals)} originals, {len(written)} excluded written), expected {expected}: {"OK" if ok else "FAILED"}')
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that N sources x K augmentation variants give N x (K - excluded + 1) MCQs.')
+    parser.add_argument('--task', default=None, help='Task to generate (offline) and augment (default: run every case in CASES)')
+    parser.add_argument('--n', type=int, default=3, help='Source samples to generate')
+    parser.add_argument('--variants', nargs='+', default=['noise_snr20', 'telephone'], help='Augmentation variants to add (with --task)')
+    parser.add_argument('--excluded', nargs='*', default=[], help='Variants that must not be applied to --task')
+    args = parser.parse_args()
+
+    cases = [(args.task, args.variants, args.excluded)] if args.task else CASES
+    ok = True
+    for task, variants, excluded in cases:
+        ok = check(task, args.n, variants, excluded) and ok
+    sys.exit(0 if ok else 1)
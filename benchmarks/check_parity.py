@@ -0,0 +1,104 @@
+"""
+Checks that the two TTS pipelines still plan the same jobs.
+
+For each pipeline, the --dry-run job list of the working tree must equal the job list of a
+baseline git revision: same records, in the same order. Both runs happen in temporary copies of
+the pipeline directory (and of the shared tts_common package, where the revision has it), so no
+logs or outputs land in the repository.
+
+--baseline is required: pass the last revision before the change under review, e.g. the
+merge-base with the main branch for a branch, or HEAD for uncommitted changes. The baseline's
+pipelines must support --dry-run --plan-file.
+
+Usage:
+    python benchmarks/check_parity.py --baseline "$(git merge-base HEAD main)"
+    python benchmarks/check_parity.py --baseline HEAD --n 100 --voice-schedule reuse
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+SHARED_PACKAGE = 'tts_common'
+IGNORE = shutil.ignore_patterns('__pycache__', 'logs', 'tmp', 'tmp_clean', 'tts_outputs*', 'tts_log*.jsonl')
+
+# pipeline directory -> (script, tasks)
+PIPELINES = {
+    'clean_sample_generation': ('tts_generation_clean.py', ['pause', 'prolong', 'stress', 'counting', 'identity']),
+    'hallucinated_sample_generation/generation': ('tts_generation.py', ['all']),
+}
+
+
+def export_tree(rev, directory, dest):
+    """Copy a pipeline directory and the shared package as of rev (None: the working tree) into dest,
+    at their places in the repository. Revisions from before the package kept the engine in the
+    pipeline directory."""
+    if rev is None:
+        for path in (directory, SHARED_PACKAGE):
+            shutil.copytree(os.path.join(REPO_ROOT, path), os.path.join(dest, path), ignore=IGNORE)
+        return
+    has_package = subprocess.run(['git', 'cat-file', '-e', f'{rev}:{SHARED_PACKAGE}'], cwd=REPO_ROOT, capture_output=True).returncode == 0
+    paths = [directory] + ([SHARED_PACKAGE] if has_package else [])
+    archive = subprocess.run(['git', 'archive', rev, '--'] + paths, cwd=REPO_ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', dest], input=archive, check=True)
+
+
+def plan_jobs(rev, directory, script, tasks, extra_args):
+    """Job records from a --dry-run of script as of rev, as JSON lines (so key order counts too)."""
+    workspace = tempfile.mkdtemp(prefix='parity_')
+    try:
+        export_tree(rev, directory, workspace)
+        cwd = os.path.join(workspace, directory)
+        plan_file = os.path.join(workspace, 'plan.jsonl')
+        cmd = [sys.executable, script, '--dry-run', '--plan-file', plan_file, '--output', 'parity_out', '--tasks'] + tasks + extra_args
+        proc = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, env=dict(os.environ, LOG_LEVEL='WARNING'))
+        if proc.returncode != 0:
+            raise RuntimeError(f'{script} @ {rev or "working tree"} failed:\n{proc.stderr[-2000:]}')
+        with open(plan_file, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        for record in records:
+            record.pop('usage', None)   # billing estimates are not part of the plan
+        return [json.dumps(record) for record in records]
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def compare(directory, baseline, current):
+    per_task = {}
+    for line in current:
+        task = json.loads(line)['task']
+        per_task[task] = per_task.get(task, 0) + 1
+    if baseline == current:
+        print(f'[plan] {directory}: identical ({len(current)} jobs: {per_task})')
+        return True
+    print(f'[plan] {directory}: DIFFERENT ({len(baseline)} baseline jobs vs {len(current)})')
+    for i, (a, b) in enumerate(zip(baseline, current)):
+        if a != b:
+            print(f'  first difference at job {i}:\n  baseline: {a}\n  current:  {b}')
+            break
+    return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check job-list parity of both pipelines against a baseline revision.')
+    parser.add_argument('--baseline', type=str, required=True, help='Git revision to compare the working tree against, e.g. the merge-base with main')
+    parser.add_argument('--n', type=int, default=None, help='Passed to both runs as --n')
+    parser.add_argument('--voice-schedule', choices=['random', 'reuse'], default=None, help='Passed to both runs (the baseline must support it)')
+    args = parser.parse_args()
+    if subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f'{args.baseline}^{{commit}}'], cwd=REPO_ROOT, capture_output=True).returncode != 0:
+        parser.error(f'--baseline {args.baseline!r} is not a commit in this repository')
+
+    extra = (['--n', str(args.n)] if args.n is not None else []) + (['--voice-schedule', args.voice_schedule] if args.voice_schedule else [])
+    ok = True
+    for directory, (script, tasks) in PIPELINES.items():
+        baseline = plan_jobs(args.baseline, directory, script, tasks, extra)
+        current = plan_jobs(None, directory, script, tasks, extra)
+        ok = compare(directory, baseline, current) and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,107 @@
+"""
+Checks that provider throttles reach the adaptive concurrency window.
+
+Each case sends one request through a TTS backend against a mock provider that throttles every
+request (benchmarks/mock_providers.py with throttle_rate=1.0), after a few successes have grown the
+provider's AIMD window out of slow start. The backend must report each 429 to CREDENTIALS: the
+requests are counted as throttled and the window shrinks. Azure cancellations that are not
+throttles (e.g. an authentication failure) must leave the window alone. Backoff sleeps are skipped.
+
+Usage:
+    python benchmarks/check_throttling.py
+"""
+
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+from mock_providers import MockAzureSynthesizer, MockProviderServer, ProviderProfile, _CancellationDetails, _Future, _SynthesisResult
+from tts_common import utils_backends
+from tts_common.utils_backends import MAX_RETRIES, AzureBackend, OpenAIBackend
+from tts_common.utils_concurrency import CONCURRENCY
+from tts_common.utils_credentials import CREDENTIALS
+from tts_common.utils_metrics import METRICS
+
+THROTTLE_ALL = ProviderProfile(p50=0.01, p99=0.02, throttle_rate=1.0)
+
+
+def counter(name, **labels):
+    inner = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return METRICS.snapshot()['counters'].get(f'{name}{{{inner}}}', 0)
+
+
+def warm_up(provider, successes=7):
+    """Grow the provider's window by one slot per success (slow start); returns the window."""
+    for _ in range(successes):
+        CONCURRENCY.release(provider, CONCURRENCY.acquire(provider), 20, True)
+    return CONCURRENCY.window(provider)
+
+
+class AuthFailingSynthesizer(MockAzureSynthesizer):
+    """Cancels every request the way Azure reports a wrong key."""
+
+    def speak_ssml_async(self, ssml):
+        details = _CancellationDetails('Authentication failed', self._error_codes.AuthenticationFailure)
+        return _Future(lambda: _SynthesisResult(self._reasons.Canceled, cancellation_details=details))
+
+
+def report(case, provider, window_before, throttled, expect_throttles=True):
+    window = CONCURRENCY.window(provider)
+    if expect_throttles:
+        ok = throttled == MAX_RETRIES and window < window_before
+    else:
+        ok = throttled == 0 and window == window_before
+    print(f'[throttle] {case}: {throttled}/{MAX_RETRIES} requests counted as throttled, '
+          f'window {window_before:g} -> {window:g}: {"OK" if ok else "FAILED"}')
+    return ok
+
+
+def check_openai(output_dir):
+    """A 429 from the OpenAI API (openai.RateLimitError) must shrink the window."""
+    from openai import OpenAI
+    server = MockProviderServer(profiles={'openai': THROTTLE_ALL}).start()
+    try:
+        CREDENTIALS.load({'OPENAI_API_KEY': 'mock'})
+        credential = CREDENTIALS.credentials('openai')[0]
+        credential.client = OpenAI(api_key='mock', base_url=f'{server.url}/v1', max_retries=0)
+        backend = OpenAIBackend(lambda: CREDENTIALS.current('openai').client)
+        before = warm_up('openai')
+        credential, start = CREDENTIALS.acquire('openai')
+        try:
+            success = backend.synthesize('Throttled request.', 'alloy', os.path.join(output_dir, 'openai.wav'))
+            throttled = counter('requests_total', provider='openai', status='throttled')
+            ok = not success and report('openai 429', 'openai', before, throttled)
+        finally:
+            CREDENTIALS.release(credential, start, 18, False)
+    finally:
+        server.stop()
+    return ok
+
+
+def check_azure(output_dir, synthesizer, case, expect_throttles):
+    """Azure cancellations: only TooManyRequests may shrink the window."""
+    CREDENTIALS.load({'AZURE_API_KEY': 'mock', 'AZURE_API_REGION': 'mock'})
+    backend = AzureBackend(lambda: synthesizer)
+    before = warm_up('azure')
+    throttled_before = counter('requests_total', provider='azure', status='throttled')
+    credential, start = CREDENTIALS.acquire('azure')
+    try:
+        success = backend.synthesize('Canceled request.', 'en-US-Mock0Neural', os.path.join(output_dir, 'azure.wav'))
+        throttled = counter('requests_total', provider='azure', status='throttled') - throttled_before
+        return not success and report(case, 'azure', before, throttled, expect_throttles)
+    finally:
+        CREDENTIALS.release(credential, start, 17, False)
+
+
+if __name__ == '__main__':
+    utils_backends.backoff = lambda retries: 0.0
+    with tempfile.TemporaryDirectory(prefix='throttling_') as output_dir:
+        ok = check_openai(output_dir)
+        ok = check_azure(output_dir, AuthFailingSynthesizer(), 'azure auth failure', expect_throttles=False) and ok
+        ok = check_azure(output_dir, MockAzureSynthesizer(THROTTLE_ALL), 'azure 429', expect_throttles=True) and ok
+    sys.exit(0 if ok else 1)
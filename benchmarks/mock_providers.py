@@ -0,0 +1,332 @@
+"""
+Local stand-ins for the TTS and LLM providers used by the generation scripts.
+
+- MockProviderServer: HTTP server speaking the OpenAI (/v1/audio/speech, /v1/chat/completions) and
+  ElevenLabs (/v1/text-to-speech/<voice_id>, /v2/voices) APIs. Point the SDK clients at it with
+  base_url. Chat completions are served under /chat/<kind>/v1 so one server can answer every task's
+  expected JSON layout (see CHAT_KINDS).
+- MockAzureSynthesizer: drop-in for speechsdk.SpeechSynthesizer (speak_ssml_async / get_voices_async and the
+  synthesis_word_boundary / bookmark_reached events), since the Azure SDK talks to its service over a websocket protocol that cannot be redirected to a local server.
+
+Every provider draws request latency from a lognormal fitted to (p50, p99) and fails a configurable
+fraction of requests with a throttling error (HTTP 429 / Azure cancellation). With a capacity, it
+also throttles every request that arrives while that many are already in flight on its API key
+(one MockAzureSynthesizer stands for one key / region), like a rate-limited API key, so adaptive
+concurrency has a limit to find and several keys have more capacity than one.
+"""
+
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import wave
+from array import array
+from dataclasses import dataclass
+from datetime import timedelta
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+SAMPLE_RATE = 16000
+OPENAI_PCM_RATE = 24000    # response_format=pcm is headerless 24 kHz mono 16-bit
+SECONDS_PER_CHAR = 0.06
+
+
+@dataclass
+class ProviderProfile:
+    p50: float                # median latency (s)
+    p99: float                # 99th percentile latency (s)
+    throttle_rate: float = 0.0
+    capacity: int = 0         # requests served concurrently per API key; more are throttled (0: unlimited)
+
+    def sample_latency(self, rng):
+        # lognormal with median p50 and 99th percentile p99 (z_0.99 = 2.326)
+        sigma = math.log(max(self.p99, self.p50) / self.p50) / 2.326 if self.p50 > 0 else 0.0
+        return self.p50 * math.exp(rng.gauss(0, sigma)) if self.p50 > 0 else 0.0
+
+
+DEFAULT_PROFILES = {
+    'openai': ProviderProfile(p50=1.2, p99=4.0, throttle_rate=0.02),
+    'elevenlabs': ProviderProfile(p50=0.5, p99=2.0, throttle_rate=0.02),
+    'azure': ProviderProfile(p50=0.8, p99=3.0, throttle_rate=0.02),
+    'chat': ProviderProfile(p50=3.0, p99=10.0, throttle_rate=0.01),
+}
+
+_TONE = array('h', (int(3000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(SAMPLE_RATE)))
+
+
+def tone_pcm(text, sample_rate=SAMPLE_RATE):
+    """16-bit mono PCM whose length follows the text length, like real speech."""
+    n = int(min(max(len(text) * SECONDS_PER_CHAR, 0.3), 10.0) * sample_rate)
+    reps = n // len(_TONE) + 1
+    return (_TONE * reps)[:n].tobytes()
+
+
+def tone_wav(text, sample_rate=SAMPLE_RATE):
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(tone_pcm(text, sample_rate))
+    return buf.getvalue()
+
+
+# chat completion payloads in the layout each gpt_prompt_generation.py task parses
+WORDS = ['really', 'want', 'to', 'go', 'home', 'after', 'the', 'long', 'meeting', 'today']
+
+
+def _sentence(i):
+    return ' '.join(WORDS[(i + k) % len(WORDS)] for k in range(7)) + f' number {i}'
+
+
+def chat_content(kind, user_msg, counter):
+    m = re.search(r'Generate (\d+)', user_msg)
+    num = int(m.group(1)) if m else 5
+    m = re.search(r'there must be (\d+) utterance', user_msg)
+    n_utt = int(m.group(1)) if m else 5
+    ids = range(counter, counter + max(num, 1))
+
+    if kind == 'scripts':
+        return json.dumps([_sentence(i) for i in ids])
+    if kind in ('pauses', 'prolonged', 'stressed'):
+        return json.dumps([{'script': _sentence(i), kind: _sentence(i).split()[1:3]} for i in ids])
+    if kind == 'accent':
+        return json.dumps([{'script': _sentence(i), 'pretend': 'british'} for i in ids])
+    if kind == 'dialogues':
+        return json.dumps([[_sentence(i * 10 + k) for k in range(n_utt)] for i in ids])
+    if kind == 'identity_scripts':
+        return json.dumps([f'I am the i-th speaker, {_sentence(i)}' for i in range(counter, counter + max(num, 6))])
+    if kind == 'counting_dict':
+        return json.dumps({str(10000 + i): {'dialogue': [_sentence(i)], 'label': 1, 'pretend': 2} for i in ids})
+    raise ValueError(f'unknown chat kind {kind}')
+
+
+CHAT_KINDS = ('scripts', 'pauses', 'prolonged', 'stressed', 'accent', 'dialogues', 'identity_scripts', 'counting_dict')
+
+
+class MockProviderServer:
+    """Threaded HTTP server standing in for the OpenAI and ElevenLabs APIs."""
+
+    def __init__(self, host='127.0.0.1', port=0, profiles=None, time_scale=1.0, seed=0, n_voices=20):
+        self.profiles = dict(DEFAULT_PROFILES, **(profiles or {}))
+        self.time_scale = time_scale
+        self.n_voices = n_voices
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._chat_counter = 0
+        self._in_flight = {}
+        self.stats = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='mock-providers', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _draw(self, provider, api_key=''):
+        """Sleep for a sampled latency; return False if this request is throttled."""
+        profile = self.profiles[provider]
+        slot = (provider, api_key)
+        with self._rng_lock:
+            latency = profile.sample_latency(self.rng) * self.time_scale
+            over = profile.capacity and self._in_flight.get(slot, 0) >= profile.capacity
+            throttled = over or self.rng.random() < profile.throttle_rate
+            key = (provider, 'throttled' if throttled else 'ok')
+            self.stats[key] = self.stats.get(key, 0) + 1
+            self._in_flight[slot] = self._in_flight.get(slot, 0) + 1
+        try:
+            time.sleep(latency)
+        finally:
+            with self._rng_lock:
+                self._in_flight[slot] -= 1
+        return not throttled
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _throttled(self):
+                self._send(429, json.dumps({'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit'}}).encode())
+
+            def _api_key(self):
+                return self.headers.get('xi-api-key') or self.headers.get('Authorization', '').removeprefix('Bearer ')
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path.endswith('/v2/voices'):
+                    voices = [{
+                        'voice_id': f'mockvoice{i:03d}',
+                        'name': f'Mock {i}',
+                        'category': 'premade',
+                        'labels': {'age': 'young' if i % 2 else 'old', 'gender': 'female' if i % 2 else 'male', 'accent': 'british' if i % 2 else 'american'},
+                    } for i in range(server.n_voices)]
+                    body = {'voices': voices, 'has_more': False, 'total_count': len(voices), 'next_page_token': None}
+                    return self._send(200, json.dumps(body).encode())
+                self._send(404, b'{}')
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                body = self._body()
+
+                if path.endswith('/audio/speech'):
+                    if not server._draw('openai', self._api_key()):
+                        return self._throttled()
+                    if body.get('response_format') == 'pcm':
+                        return self._send(200, tone_pcm(body.get('input', ''), OPENAI_PCM_RATE), 'audio/pcm')
+                    return self._send(200, tone_wav(body.get('input', '')), 'audio/wav')
+
+                m = re.search(r'/text-to-speech/([^/]+)$', path)
+                if m:
+                    if not server._draw('elevenlabs', self._api_key()):
+                        return self._throttled()
+                    return self._send(200, tone_pcm(body.get('text', '')), 'application/octet-stream')
+
+                m = re.match(r'/chat/([a-z_]+)/v1/chat/completions$', path)
+                if m:
+                    if not server._draw('chat', self._api_key()):
+                        return self._throttled()
+                    user_msg = next((msg['content'] for msg in body.get('messages', []) if msg['role'] == 'user'), '')
+                    with server._rng_lock:
+                        counter = server._chat_counter
+                        server._chat_counter += 1000
+                    content = chat_content(m.group(1), user_msg, counter)
+                    reply = {
+                        'id': f'chatcmpl-mock{counter}',
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': body.get('model', 'mock'),
+                        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+                    }
+                    return self._send(200, json.dumps(reply).encode())
+
+                self._send(404, b'{}')
+
+        return Handler
+
+
+class _Future:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def get(self):
+        return self._fn()
+
+
+class _CancellationDetails:
+    def __init__(self, error_details, error_code):
+        self.reason = 'Error'
+        self.error_code = error_code
+        self.error_details = error_details
+
+    def __str__(self):
+        return f'CancellationDetails(reason=Error, error_code={self.error_code}, error_details="{self.error_details}")'
+
+
+class _SynthesisResult:
+    def __init__(self, reason, audio_data=b'', cancellation_details=None):
+        self.reason = reason
+        self.audio_data = audio_data
+        self.cancellation_details = cancellation_details
+        self.result_id = uuid.uuid4().hex
+
+
+class _EventSignal:
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def fire(self, evt):
+        for callback in self.callbacks:
+            callback(evt)
+
+
+class _Voice:
+    def __init__(self, i):
+        self.short_name = f'en-US-Mock{i}Neural'
+        self.name = f'Microsoft Server Speech Text to Speech Voice (en-US, Mock{i}Neural)'
+        self.locale = 'en-US'
+        self.gender = 'SynthesisVoiceGender.Female' if i % 2 else 'SynthesisVoiceGender.Male'
+
+
+class MockAzureSynthesizer:
+    """In-process stand-in for speechsdk.SpeechSynthesizer with sampled latency and throttling."""
+
+    def __init__(self, profile=None, time_scale=1.0, seed=0, n_voices=126):
+        import azure.cognitiveservices.speech as speechsdk
+        self._reasons = speechsdk.ResultReason
+        self._error_codes = speechsdk.CancellationErrorCode
+        self._word_boundary = speechsdk.SpeechSynthesisBoundaryType.Word
+        self.synthesis_word_boundary = _EventSignal()
+        self.bookmark_reached = _EventSignal()
+        self.profile = profile or DEFAULT_PROFILES['azure']
+        self.time_scale = time_scale
+        self.n_voices = n_voices
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {}
+
+    def speak_ssml_async(self, ssml):
+        def run():
+            with self._lock:
+                latency = self.profile.sample_latency(self.rng) * self.time_scale
+                over = self.profile.capacity and self._in_flight >= self.profile.capacity
+                throttled = over or self.rng.random() < self.profile.throttle_rate
+                key = 'throttled' if throttled else 'ok'
+                self.stats[key] = self.stats.get(key, 0) + 1
+                self._in_flight += 1
+            try:
+                time.sleep(latency)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+            if throttled:
+                return _SynthesisResult(self._reasons.Canceled, cancellation_details=_CancellationDetails('Status(429): Too many requests', self._error_codes.TooManyRequests))
+            text = ' '.join(re.sub(r'<[^>]+>', '', ssml).split())
+            result = _SynthesisResult(self._reasons.SynthesizingAudioCompleted, tone_wav(text))
+            # word boundaries spread over the tone in proportion to word length, in 100 ns ticks like the SDK
+            seconds, total, offset = len(tone_pcm(text)) / 2 / SAMPLE_RATE, max(len(text.replace(' ', '')), 1), 0.0
+            for word in text.split():
+                duration = seconds * len(word) / total
+                self.synthesis_word_boundary.fire(SimpleNamespace(
+                    result_id=result.result_id, text=word, audio_offset=int(offset * 1e7),
+                    duration=timedelta(seconds=duration), boundary_type=self._word_boundary))
+                offset += duration
+            return result
+        return _Future(run)
+
+    def get_voices_async(self, locale=''):
+        voices = [_Voice(i) for i in range(self.n_voices)]
+        return _Future(lambda: type('VoicesResult', (), {'voices': voices})())
@@ -1,11 +1,15 @@
+import os
+import sys
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
 load_dotenv()
 
-import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))    # repository root: the shared tts_common package
+from tts_common.utils_credentials import CREDENTIALS
 
-SPEECH_KEY = os.getenv('AZURE_API_KEY')
-SPEECH_REGION = os.getenv('AZURE_API_REGION')
+# the first key / region if AZURE_API_KEY lists several
+SPEECH_KEY = CREDENTIALS.current('azure').key
+SPEECH_REGION = CREDENTIALS.current('azure').region
 
 speech_config = speechsdk.SpeechConfig(subscription=SPEECH_KEY, region=SPEECH_REGION)
 azure_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
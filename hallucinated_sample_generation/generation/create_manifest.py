@@ -2,7 +2,8 @@
 Notes:
 - By default, `prompt` comes from each item's "question". Pass --prompt to override with a constant string.
 - `output` defaults to each item's "answer_gt" (override with --output-field).
-- If --compute-duration is set, the script will try to read .wav durations. If files are missing/unreadable, it falls back to null.
+- If --compute-duration is set, the script will try to read .wav / .flac durations (from the header, without decoding). If files are missing/unreadable, it falls back to null.
+- When computing durations, audio stored flat or under another --fanout depth than its audio_path is found (utils_paths.locate) and its name updated.
 - Input can be a JSON array or JSONL (one JSON object per line).
 """
 
@@ -11,9 +12,12 @@ import json
 import os
 import sys
 from typing import List, Dict, Any, Optional
-import wave
 import re
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))    # repository root: the shared tts_common package
+from tts_common.utils_manifest import build_prompt_with_choices, get_audio_duration_seconds
+from tts_common.utils_paths import locate
+
 def load_items(path: str) -> List[Dict[str, Any]]:
     """Load input as JSON array; if that fails, try JSONL."""
     with open(path, "r", encoding="utf-8") as f:
@@ -37,50 +41,12 @@ def load_items(path: str) -> List[Dict[str, Any]]:
             items.append(obj)
         return items
 
-def get_wav_duration_seconds(path: str) -> Optional[float]:
-    """Get duration for a WAV file using the stdlib wave module."""
-    try:
-        with wave.open(path, "rb") as wf:
-            frames = wf.getnframes()
-            rate = wf.getframerate()
-            if rate and frames:
-                return round(frames / float(rate), 6)
-    except Exception:
-        return None
-    return None
-
 def resolve_audio_path(audio_path: str, audio_root: Optional[str]) -> str:
     """If audio_root is provided, join it with audio_path; else use audio_path as-is."""
     if audio_root:
         return os.path.join(audio_root, audio_path)
     return audio_path
 
-def build_prompt_with_choices(item: Dict[str, Any]) -> str:
-    """If override provided, use it; else build: 'question (A): choice_a. (B): choice_b. ...'"""
-    q = (item.get("question") or "").strip()
-    pieces = []
-
-    # Include choices in A..Z order if present: choice_a, choice_b, ...
-    letters = "abcd"
-    for i, letter in enumerate(letters):
-        key = f"choice_{letter}"
-        if key in item:
-            label = chr(ord('A') + i)  # A, B, C, ...
-            val = str(item[key]).strip()
-            # Ensure a trailing period for each choice piece
-            if val and val[-1] not in ".!?":
-                val = val + "."
-            pieces.append(f"({label}): {val}")
-
-    # Build final prompt
-    if pieces:
-        # Ensure the question ends with punctuation
-        if q and q[-1] not in "?!:.":
-            q = q + "?"
-        return (q + " " + " ".join(pieces)).strip()
-    else:
-        return q  # fallback to just the question
-
 def _iter_choices(item: Dict[str, Any]):
     """Yield tuples of (label_char, key, value) for choice_a..choice_z that exist."""
     letters = "abcd"
@@ -159,10 +125,13 @@ def convert(
         output_value = build_output_with_letter(item, output_field)
 
         duration = None
-        if compute_duration and name.lower().endswith(".wav"):
-            actual_path = resolve_audio_path(name, split_path)
+        if compute_duration and name.lower().endswith((".wav", ".flac")):
+            expected_path = resolve_audio_path(name, split_path)
+            actual_path = locate(expected_path)
+            if actual_path != expected_path:
+                name = os.path.relpath(actual_path, split_path) if split_path else actual_path
             if os.path.isfile(actual_path):
-                duration = get_wav_duration_seconds(actual_path)
+                duration = get_audio_duration_seconds(actual_path)
             else:
                 print(f'no file found: {actual_path}')
                 duration = None  # file missing; leave null
@@ -184,7 +153,7 @@ def main():
     parser.add_argument("--split-path", default="/wekafs/ict/pangj/data/speech_benchmark_samples", help="Value for 'split_path' in output JSON.")
     parser.add_argument("--flamingo-task", default="VoxParadox-AQA", help="Value for 'flamingo_task'")
     parser.add_argument("--output-field", default="answer_gt", help="Which input field becomes 'output'. Default: answer_gt")
-    parser.add_argument("--compute-duration", type=bool, default=True, help="Compute .wav duration if accessible.")
+    parser.add_argument("--compute-duration", type=bool, default=True, help="Compute .wav / .flac duration if accessible.")
 
     args = parser.parse_args()
 
@@ -1,21 +1,29 @@
 import os
+import sys
+import copy
 import json
+import logging
 import argparse
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
 from gpt_prompt_templates import TASK_TEMPLATES
 
 import random
 random.seed(42)
-from itertools import permutations
 
 import re
 
-from utils_logging import setup_logger
-setup_logger('gpt_prompt_generation')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))    # repository root: the shared tts_common package
+from tts_common.utils_logging import setup_logger
+from tts_common.utils_credentials import CREDENTIALS
+from tts_common.utils_prompt_store import PromptStore
+from tts_common.utils_sampling import sample_permutations
+logger = logging.getLogger(__name__)
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# created on first use so importing this module never builds an API client
+client = None
+_client_lock = threading.Lock()
 
 INPUT_FILE = 'tts_prompts_base.json'
 
@@ -23,13 +31,17 @@ INT_TO_ORDINAL = {
     0: 'first', 1: 'second', 2: 'third', 3: 'fourth', 4: 'fifth'
 }
 
+def get_client():
+    global client
+    with _client_lock:
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=CREDENTIALS.current('openai').key)    # the first of the listed keys
+    return client
+
 def query(system_msg, user_msg):
-    print('=================================================')
-    print(system_msg)
-    print('-------------------------------------------------')
-    print(user_msg)
-    print('=================================================')
-    response = client.chat.completions.create(
+    logger.debug('=================================================\n%s\n-------------------------------------------------\n%s\n=================================================', system_msg, user_msg)
+    response = get_client().chat.completions.create(
         model='gpt-4o-mini',
         messages=[
             {'role': 'system', 'content': system_msg},
@@ -249,8 +261,7 @@ def process_response_identity(task_data, message, num_new_subtask, start_index):
         if not isinstance(scripts, list):
             raise ValueError('Expected a JSON array of strings.')
         
-        dialogues = list(permutations(scripts, 5))
-        dialogues = random.sample(dialogues, num_new_subtask)
+        dialogues = sample_permutations(scripts, 5, num_new_subtask)
                
         for dialogue in dialogues:
             dialogue_l = list(dialogue)
@@ -527,13 +538,14 @@ if __name__ == '__main__':
     parser.add_argument('--task', type=str, required=True, help='The task to extend (e.g., age, volume, pitch, speed, emotion, counting).')
     parser.add_argument('--subtask', type=str, default=None, help='Optional: Only extend this subtask instead of all subtasks.')
     parser.add_argument('--n', type=int, default=1, help='Number of new contrastive examples')
+    parser.add_argument('--export', action='store_true', help='Write the prompt store back to the JSON file afterwards')
     args = parser.parse_args()
+    setup_logger('gpt_prompt_generation')
 
-    # output_file = f'tts_prompts_{args.task}_extended.json'
-    output_file = INPUT_FILE
-
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        prompts = json.load(f)
+    store = PromptStore(INPUT_FILE)
+    # only the extended task is read from the store; the extend_* functions see the usual {task: data} dict
+    prompts = {args.task: store.task(args.task)} if args.task in store.tasks() else {}
+    before = copy.deepcopy(prompts.get(args.task, {}))
 
     if args.task == 'counting':
         prompts = extend_counting_task(args.n, prompts)
@@ -550,6 +562,8 @@ if __name__ == '__main__':
     else:
         raise NotImplementedError(f'task {args.task} not implemented.')
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(prompts, f, indent=4)
-    print(f'Saved extended prompts to {output_file}')
+    # append only what the extension added; the JSON file is rewritten on --export
+    added = store.sync(args.task, before, prompts[args.task]) if args.task in prompts else 0
+    print(f'Appended {added} entries for {args.task} to {store.store_path}')
+    if args.export:
+        print(f'Exported prompts to {store.export()}')
@@ -0,0 +1,185 @@
+"""
+Pack generated audio and its MCQ metadata into WebDataset tar shards.
+
+Each sample is two tar members sharing a key: <key>.wav or <key>.flac (the audio file as
+generated) and <key>.json (the MCQ item, as written by post_processing_mcqs.py). A shard is closed
+once it reaches --shard-size-mb, so loaders read a few large files sequentially instead of opening
+tens of thousands of small files on a network filesystem. Shards are plain uncompressed tars,
+readable by the webdataset package as well as by iter_samples() below.
+
+<output>/index.json maps every key to its shard, the (offset, size) of both members and the audio
+extension, so ShardIndex.get(key) reads one sample with a seek and two reads, without scanning the tar.
+
+Usage:
+    python pack_shards.py --input output_mcq.json --audio-root . --output shards
+    python pack_shards.py --input output_mcq.json --audio-root /data/speech_benchmark_samples --shard-size-mb 512
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tarfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))    # repository root: the shared tts_common package
+from create_manifest import load_items, resolve_audio_path
+from tts_common.utils_paths import locate
+
+INDEX_FILE = 'index.json'
+
+
+def sample_key(item):
+    """WebDataset key: the MCQ id (or the audio file name); dots would split it into extensions."""
+    key = item.get('id') or os.path.splitext(os.path.basename(item['audio_path']))[0]
+    return key.replace('.', '_')
+
+
+class ShardWriter:
+    """Writes samples into <output>/<prefix>-000000.tar, -000001.tar, ... of at most max_bytes each."""
+
+    def __init__(self, output_dir, prefix='shard', max_bytes=256 * 1024 ** 2):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.shards = []
+        self.samples = {}    # key -> [shard index, audio offset, audio size, json offset, json size, audio extension]
+        self.tar = None
+        self.file = None
+
+    def _open(self):
+        name = f'{self.prefix}-{len(self.shards):06d}.tar'
+        self.file = open(os.path.join(self.output_dir, name), 'wb')
+        self.tar = tarfile.open(fileobj=self.file, mode='w', format=tarfile.USTAR_FORMAT)
+        self.shards.append(name)
+
+    def _add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = 0    # reproducible shards
+        self.tar.addfile(info, io.BytesIO(data))
+        # the data ends the member, padded to a whole block
+        padded = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        return [self.tar.offset - padded, len(data)]
+
+    def write(self, key, audio, metadata, ext='wav'):
+        if key in self.samples:
+            raise ValueError(f'Duplicate sample key: {key}')
+        if self.tar is not None and self.file.tell() >= self.max_bytes:
+            self.close()
+        if self.tar is None:
+            self._open()
+        audio_span = self._add(f'{key}.{ext}', audio)
+        meta = self._add(f'{key}.json', json.dumps(metadata, ensure_ascii=False).encode('utf-8'))
+        self.samples[key] = [len(self.shards) - 1] + audio_span + meta + [ext]
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.file.close()
+            self.tar = self.file = None
+
+    def write_index(self):
+        with open(os.path.join(self.output_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'shards': self.shards, 'samples': self.samples}, f)
+
+
+def pack(items, audio_root, output_dir, shard_size_mb=256, prefix='shard'):
+    """Pack MCQ items and their audio into shards; returns the ShardWriter (shards, samples)."""
+    os.makedirs(output_dir, exist_ok=True)
+    writer = ShardWriter(output_dir, prefix, int(shard_size_mb * 1024 ** 2))
+    missing = 0
+    for item in items:
+        path = locate(resolve_audio_path(item['audio_path'], audio_root))
+        if not os.path.isfile(path):
+            print(f'no file found: {path}')
+            missing += 1
+            continue
+        with open(path, 'rb') as f:
+            audio = f.read()
+        writer.write(sample_key(item), audio, item, os.path.splitext(path)[1][1:].lower() or 'wav')
+    writer.close()
+    writer.write_index()
+    print(f'Packed {len(writer.samples)} samples into {len(writer.shards)} shards in {output_dir} ({missing} missing audio files)')
+    return writer
+
+
+def iter_members(path, buffer_size=1 << 20):
+    """(name, data) of the regular files in an uncompressed tar, read front to back through one
+    buffered file (tarfile's stream mode costs several times more per member)."""
+    with open(path, 'rb', buffering=buffer_size) as f:
+        while True:
+            header = f.read(tarfile.BLOCKSIZE)
+            if len(header) < tarfile.BLOCKSIZE or header == tarfile.NUL * tarfile.BLOCKSIZE:
+                return
+            info = tarfile.TarInfo.frombuf(header, 'utf-8', 'surrogateescape')
+            data = f.read(info.size)
+            f.seek(-info.size % tarfile.BLOCKSIZE, os.SEEK_CUR)
+            if info.isreg():
+                yield info.name, data
+
+
+def iter_samples(shard_paths):
+    """Stream {'__key__', 'wav' or 'flac': bytes, 'json': dict} from shards in order, reading each tar sequentially."""
+    for path in shard_paths:
+        sample = None
+        for name, data in iter_members(path):
+            key, ext = name.split('.', 1)
+            if sample is not None and sample['__key__'] != key:
+                yield sample
+                sample = None
+            if sample is None:
+                sample = {'__key__': key}
+            sample[ext] = json.loads(data) if ext == 'json' else data
+        if sample is not None:
+            yield sample
+
+
+class ShardIndex:
+    """Random access into packed shards through index.json."""
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.shards = [os.path.join(shard_dir, name) for name in index['shards']]
+        self.samples = index['samples']
+        self._files = {}
+
+    def __len__(self):
+        return len(self.samples)
+
+    def keys(self):
+        return list(self.samples)
+
+    def _read(self, shard, offset, size):
+        if shard not in self._files:
+            self._files[shard] = open(self.shards[shard], 'rb')
+        f = self._files[shard]
+        f.seek(offset)
+        return f.read(size)
+
+    def get(self, key):
+        shard, audio_offset, audio_size, json_offset, json_size, ext = self.samples[key]
+        return {
+            '__key__': key,
+            ext: self._read(shard, audio_offset, audio_size),
+            'json': json.loads(self._read(shard, json_offset, json_size)),
+        }
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack audio and MCQ metadata into WebDataset tar shards with a random-access index.')
+    parser.add_argument('--input', default='output_mcq.json', help='MCQ JSON (array) or JSONL from post_processing_mcqs.py')
+    parser.add_argument('--audio-root', default=None, help='Directory the items\' audio_path is relative to (default: as is)')
+    parser.add_argument('--output', default='shards', help='Output directory for the .tar shards and index.json')
+    parser.add_argument('--shard-size-mb', type=float, default=256, help='Start a new shard once one reaches this size')
+    parser.add_argument('--prefix', default='shard', help='Shard file name prefix')
+    args = parser.parse_args()
+
+    pack(load_items(args.input), args.audio_root, args.output, args.shard_size_mb, args.prefix)
@@ -1,12 +1,19 @@
 import argparse
 import json
 import os
+import sys
 
 from string import punctuation
 
 import random
 random.seed(42)
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))    # repository root: the shared tts_common package
+from tts_common.utils_paths import locate, rebase
+
+OUTPUT_ROOT = './tts_outputs'           # where tts_generation.py wrote the audio: the prefix of every ledger path
+MCQ_AUDIO_ROOT = 'vox_paradox_mcq_tts'  # what audio_path is relative to in the released MCQs
+
 TASK_NAME_MAP = {
     'accent': 'accent_identification',
     'age': 'age_prediction',
@@ -27,8 +34,13 @@ INT_TO_ORDINAL = {
     0: 'first', 1: 'second', 2: 'third', 3: 'fourth', 4: 'fifth'
 }   
 
+def sample_key(obj, keys=('task', 'subtask', 'index', 'voice')):
+    """Deduplication identity of a ledger record. Augmented variants (tts_engine --augment) copy
+    their source's task/subtask/index/voice, so the variant name is part of the key: the original
+    and each of its variants are separate samples."""
+    return tuple(obj[k] for k in keys) + ((obj.get('augment') or {}).get('variant', ''),)
+
 def load_and_join(input_path, delimiter='|'):
-    keys = ('task', 'subtask', 'index', 'voice')
     data = {}
 
     with open(input_path, 'r', encoding='utf-8') as f:
@@ -47,7 +59,7 @@ def load_and_join(input_path, delimiter='|'):
                     obj[field] = delimiter.join(str(x) for x in value)
 
             try:
-                key = tuple(obj[k] for k in keys)
+                key = sample_key(obj)
             except KeyError as e:
                 print(f"Missing key {e} at line {i}")
                 continue
@@ -59,15 +71,18 @@ def load_and_join(input_path, delimiter='|'):
 
     return ordered
 
-def verify_file_integrity(data, data_dir='./tts_outputs'):
+def verify_file_integrity(data, data_dir=OUTPUT_ROOT):
+    """Check every item's audio under data_dir (the generation output tree, possibly moved). Audio
+    found flat or at another --fanout depth than its ledger path gets its path updated."""
     task_sample_count = {}
     missing = []
     for item in data:
         path = item.get('path')
-        path = os.path.join(data_dir, path)
-        if not path or os.path.isfile(path):
+        found = locate(rebase(path, OUTPUT_ROOT, data_dir)) if path else None
+        if not found or not os.path.isfile(found):
             missing.append(item)
         else:
+            item['path'] = rebase(found, data_dir, OUTPUT_ROOT)
             task = item['task']
             if task not in task_sample_count:
                 task_sample_count[task] = 1
@@ -226,7 +241,7 @@ def create_mcqs(data):
         task_name = TASK_NAME_MAP[task]
         basename, _= os.path.splitext(d['filename'])
         id = f'{task_name}__{basename}'
-        audio_path = d['path'].replace("./tts_outputs", "vox_paradox_mcq_tts", 1)
+        audio_path = rebase(d['path'], OUTPUT_ROOT, MCQ_AUDIO_ROOT)
         # audio_path = f'/audio/{id}.wav'
         if task == 'age':
             mcq = mcq_age(d)
@@ -259,14 +274,15 @@ def create_mcqs(data):
     return res
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Deduplicate JSONL by (task, subtask, index), keeping the last occurrence.")
+    parser = argparse.ArgumentParser(description="Deduplicate JSONL by (task, subtask, index, voice, augmentation variant), keeping the last occurrence.")
     parser.add_argument("--input", default="tts_log.jsonl", help="Path to input .jsonl")
     parser.add_argument("--output", default="output_mcq.json", help="Path to write deduped .json")
+    parser.add_argument("--data-dir", default=OUTPUT_ROOT, help="Generation output directory to check the audio in (default: where tts_generation.py writes it)")
     args = parser.parse_args()
 
     # load and deduplicate 
     data = load_and_join(args.input)
-    missing, task_sample_count = verify_file_integrity(data)
+    missing, task_sample_count = verify_file_integrity(data, args.data_dir)
 
     if missing:
         print('missing files:')
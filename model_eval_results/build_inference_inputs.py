@@ -0,0 +1,221 @@
+"""
+Build sharded inference inputs from the MCQ (post_processing_mcqs.py) or Flamingo manifest (create_manifest.py) output.
+
+- Records are grouped by task and sorted by audio duration inside each task, so a batch of
+  consecutive records has similar lengths and little padding.
+- Each task is split into shards of at most --shard-size records (and --max-shard-seconds of audio).
+- index.json lists every shard with the original position of each of its records, so per-shard
+  model outputs can be reassembled into one <model>_test_outputs<N>.jsonl for test_eval.py.
+  Outputs are matched to records by their audio path, not by line order.
+
+Usage:
+    python build_inference_inputs.py build -i vox_paradox_mcq_tts.json --audio-root /data -o inference_inputs/voxparadox_test1_shards
+    python build_inference_inputs.py reassemble --index inference_inputs/voxparadox_test1_shards/index.json -o audio_flamingo_2/audio_flamingo_2_test_outputs1.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))    # repository root: the shared tts_common package
+from tts_common.utils_manifest import build_prompt_with_choices, get_audio_duration_seconds    # the manifest's prompts, byte for byte
+from tts_common.utils_paths import locate
+
+
+def load_records(path):
+    """Return [{path, prompt, task, duration}] from an MCQ list or a Flamingo-style manifest."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    records = []
+    if isinstance(data, dict) and 'data' in data:
+        # create_manifest.py output: durations are already computed
+        for item in data['data'].values():
+            name = item['name']
+            records.append({
+                'path': name,
+                'prompt': item['prompt'],
+                'task': task_from_path(name),
+                'duration': item.get('duration'),
+            })
+    else:
+        for item in data:
+            records.append({
+                'path': item['audio_path'],
+                'prompt': build_prompt_with_choices(item),
+                'task': item.get('task_name') or task_from_path(item['audio_path']),
+                'duration': None,
+            })
+    return records
+
+
+def task_from_path(path):
+    """vox_paradox_mcq_tts/<task>/... -> <task>"""
+    parts = os.path.normpath(path).split(os.sep)
+    return parts[1] if len(parts) > 2 else 'default'
+
+
+def fill_durations(records, audio_root):
+    """Durations from the .wav / .flac headers under audio_root; a file stored flat or at another
+    --fanout depth than its path is found with locate()."""
+    missing = 0
+    for r in records:
+        if r['duration'] is None and audio_root:
+            r['duration'] = get_audio_duration_seconds(locate(os.path.join(audio_root, r['path'])))
+        if r['duration'] is None:
+            missing += 1
+    if missing:
+        print(f'WARNING: {missing}/{len(records)} records have no duration (no --audio-root, file missing, or not .wav / .flac); '
+              f'they are placed unsorted at the end of their task')
+
+
+def padding_fraction(durations, batch_size):
+    """Fraction of padded audio when consecutive records are batched and padded to the batch max."""
+    padded = total = 0.0
+    for start in range(0, len(durations), batch_size):
+        batch = durations[start:start + batch_size]
+        padded += max(batch) * len(batch)
+        total += sum(batch)
+    return 1 - total / padded if padded else 0.0
+
+
+def build_shards(records, output_dir, shard_size, max_shard_seconds=None, batch_size=8):
+    """Write task/duration-sorted shards and index.json; returns the index."""
+    os.makedirs(output_dir, exist_ok=True)
+    by_task = {}
+    for pos, r in enumerate(records):
+        by_task.setdefault(r['task'], []).append(pos)
+
+    shards = []
+    for task in sorted(by_task):
+        positions = by_task[task]
+        before = padding_fraction([records[p]['duration'] or 0.0 for p in positions], batch_size)
+        positions.sort(key=lambda p: (records[p]['duration'] is None, records[p]['duration'] or 0.0, records[p]['path']))
+        after = padding_fraction([records[p]['duration'] or 0.0 for p in positions], batch_size)
+        print(f'task {task}: {len(positions)} records, padding at batch size {batch_size}: {before:.1%} -> {after:.1%}')
+
+        chunk, seconds, shard_id = [], 0.0, 0
+        for p in positions:
+            duration = records[p]['duration'] or 0.0
+            full = len(chunk) >= shard_size or (max_shard_seconds and chunk and seconds + duration > max_shard_seconds)
+            if full:
+                shards.append(write_shard(records, output_dir, task, shard_id, chunk))
+                chunk, seconds, shard_id = [], 0.0, shard_id + 1
+            chunk.append(p)
+            seconds += duration
+        if chunk:
+            shards.append(write_shard(records, output_dir, task, shard_id, chunk))
+
+    index = {'n_records': len(records), 'shards': shards}
+    with open(os.path.join(output_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    print(f'wrote {len(shards)} shards for {len(records)} records to {output_dir}')
+    return index
+
+
+def write_shard(records, output_dir, task, shard_id, positions):
+    rel = os.path.join(task, f'shard_{shard_id:04d}.jsonl')
+    path = os.path.join(output_dir, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for p in positions:
+            f.write(json.dumps({'path': records[p]['path'], 'prompt': records[p]['prompt']}) + '\n')
+    durations = [records[p]['duration'] or 0.0 for p in positions]
+    return {
+        'file': rel,
+        'task': task,
+        'n': len(positions),
+        'seconds': round(sum(durations), 3),
+        'max_duration': round(max(durations), 3),
+        'positions': positions,
+    }
+
+
+def outputs_file_for(shard_file, suffix):
+    return shard_file[:-len('.jsonl')] + suffix
+
+
+def record_key(path):
+    """Join key between a shard record and a model output: the normalized audio path."""
+    path = os.path.normpath(path.strip())
+    return path[2:] if path.startswith('./') else path
+
+
+def match_outputs(shard_file, positions, outputs):
+    """{position: output} for one shard, matching each output to the record with the same path.
+    Raises ValueError listing the records without an output and the outputs without a record."""
+    with open(shard_file, 'r', encoding='utf-8') as f:
+        paths = [json.loads(line)['path'] for line in f if line.strip()]
+    slots = {}    # key -> positions still waiting for an output (a path may be asked more than once)
+    for pos, path in zip(positions, paths):
+        slots.setdefault(record_key(path), []).append(pos)
+    matched, extra = {}, []
+    for out in outputs:
+        waiting = slots.get(record_key(out.get('path', '')))
+        if waiting:
+            matched[waiting.pop(0)] = out
+        else:
+            extra.append(out.get('path'))
+    missing = [path for path, waiting in slots.items() for _ in waiting]
+    if missing or extra:
+        raise ValueError(f'{shard_file}: {len(missing)} records without output {missing[:10]}, '
+                         f'{len(extra)} outputs without record {extra[:10]}')
+    return matched
+
+
+def reassemble_outputs(index_path, output_path, suffix='.outputs.jsonl'):
+    """Merge per-shard model outputs back into the original record order. A shard whose outputs do
+    not cover exactly its records' paths raises ValueError; shards without outputs are reported."""
+    base = os.path.dirname(index_path)
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+
+    merged = [None] * index['n_records']
+    missing_shards = []
+    for shard in index['shards']:
+        path = os.path.join(base, outputs_file_for(shard['file'], suffix))
+        if not os.path.exists(path):
+            missing_shards.append(path)
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            outputs = [json.loads(line) for line in f if line.strip()]
+        for pos, out in match_outputs(os.path.join(base, shard['file']), shard['positions'], outputs).items():
+            merged[pos] = out
+
+    done = [m for m in merged if m is not None]
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for m in done:
+            f.write(json.dumps(m) + '\n')
+
+    print(f'wrote {len(done)}/{len(merged)} outputs to {output_path}')
+    for path in missing_shards:
+        print(f'missing shard outputs: {path}')
+    return len(done), len(merged)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shard voxparadox inference inputs by task and duration.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Write sharded inference inputs and index.json')
+    build.add_argument('-i', '--input', default='vox_paradox_mcq_tts.json', help='MCQ JSON or Flamingo manifest JSON')
+    build.add_argument('-o', '--output-dir', default='inference_inputs/voxparadox_shards')
+    build.add_argument('--audio-root', default=None, help='Root the audio paths are relative to (for durations)')
+    build.add_argument('--shard-size', type=int, default=1000, help='Maximum records per shard')
+    build.add_argument('--max-shard-seconds', type=float, default=None, help='Maximum total audio seconds per shard')
+    build.add_argument('--batch-size', type=int, default=8, help='Model batch size used to report padding waste')
+
+    reassemble = sub.add_parser('reassemble', help='Merge per-shard outputs in original order')
+    reassemble.add_argument('--index', required=True, help='index.json written by build')
+    reassemble.add_argument('-o', '--output', required=True, help='Merged outputs .jsonl for test_eval.py')
+    reassemble.add_argument('--suffix', default='.outputs.jsonl', help='Per-shard outputs file replaces .jsonl with this suffix')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        records = load_records(args.input)
+        fill_durations(records, args.audio_root)
+        build_shards(records, args.output_dir, args.shard_size, args.max_shard_seconds, args.batch_size)
+    else:
+        reassemble_outputs(args.index, args.output, args.suffix)
@@ -1,9 +1,263 @@
 import argparse
+import hashlib
 import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+LETTERS = 'abcd'
+LETTER_TO_INDEX = {letter: i for i, letter in enumerate(LETTERS)}
+
+# ordered from most to least specific; the first match wins
+CHOICE_PATTERNS = [
+    re.compile(r'^\s*\(\s*([a-d])\s*\)', re.IGNORECASE),                      # "(b) young adult."
+    re.compile(r'^\s*([a-d])\s*[):.]', re.IGNORECASE),                        # "b) ...", "B: ...", "b. ..."
+    re.compile(r'^\s*([a-d])\s*$', re.IGNORECASE),                            # "B"
+    re.compile(r'\b(?:answer|option|choice)\s*(?:is)?\s*:?\s*\(?([a-d])\b', re.IGNORECASE),  # "the answer is (c)"
+]
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_path(path):
+    """Canonical join key for outputs `path` and MCQ `audio_path`."""
+    path = os.path.normpath(path.strip())
+    return path[2:] if path.startswith('./') else path
+
+
+def normalize_text(s):
+    """Lowercase, collapse whitespace, strip trailing punctuation."""
+    return WHITESPACE.sub(' ', str(s).strip()).rstrip('.!?').lower()
+
+
+def build_mcq_index(mcqs):
+    """Hash index audio_path -> mcq, so each output is joined in O(1)."""
+    return {normalize_path(m['audio_path']): m for m in mcqs}
+
+
+def choice_index(mcq, value):
+    """Index of the choice holding `value`, or -1 if no choice matches."""
+    value = normalize_text(value)
+    for i, letter in enumerate(LETTERS):
+        choice = mcq.get(f'choice_{letter}')
+        if choice is not None and normalize_text(choice) == value:
+            return i
+    return -1
+
+
+def extract_choice(output, mcq):
+    """Return the index (0-3) of the letter chosen in a free-form output, or -1."""
+    for pattern in CHOICE_PATTERNS:
+        m = pattern.search(output)
+        if m:
+            return LETTER_TO_INDEX[m.group(1).lower()]
+    # fallback: the model answered with the choice text instead of a letter
+    return choice_index(mcq, output)
+
+
+def join_outputs(index, task_ids, results):
+    """Join outputs to MCQs and return the (task, pred, gt, pretend) columns plus unmatched paths."""
+    n = len(results)
+    task = np.empty(n, dtype=np.int16)
+    pred = np.empty(n, dtype=np.int8)
+    gt = np.empty(n, dtype=np.int8)
+    pretend = np.empty(n, dtype=np.int8)
+
+    joined = 0
+    unmatched = []
+    for r in results:
+        m = index.get(normalize_path(r['path']))
+        if m is None:
+            unmatched.append(r['path'])
+            continue
+        task[joined] = task_ids[m['task_name']]
+        pred[joined] = extract_choice(r.get('output', ''), m)
+        gt[joined] = choice_index(m, m['answer_gt'])
+        pretend[joined] = choice_index(m, m['pretend_label'])
+        joined += 1
+
+    return task[:joined], pred[:joined], gt[:joined], pretend[:joined], unmatched
 
 
 def eval_results(mcq, results):
-    pass
+    """Score model outputs against MCQs: per-task accuracy and pretend-label rate."""
+    index = build_mcq_index(mcq)
+    task_names = sorted({m['task_name'] for m in mcq})
+    task_ids = {t: i for i, t in enumerate(task_names)}
+
+    task, pred, gt, pretend, unmatched = join_outputs(index, task_ids, results)
+    return summarize(task_names, task, pred, gt, pretend, unmatched)
+
+
+def summarize(task_names, task, pred, gt, pretend, unmatched=()):
+    """Vectorized per-task aggregation over the joined columns."""
+    n_tasks = len(task_names)
+    counts = np.bincount(task, minlength=n_tasks)
+    correct = np.bincount(task, weights=(pred == gt) & (gt >= 0), minlength=n_tasks)
+    pretended = np.bincount(task, weights=(pred == pretend) & (pretend >= 0), minlength=n_tasks)
+    unparsed = np.bincount(task, weights=pred < 0, minlength=n_tasks)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = correct / counts
+        pretend_rate = pretended / counts
+
+    per_task = {}
+    for i, name in enumerate(task_names):
+        if counts[i] == 0:
+            continue
+        per_task[name] = {
+            'n': int(counts[i]),
+            'accuracy': float(accuracy[i]),
+            'pretend_rate': float(pretend_rate[i]),
+            'unparsed': int(unparsed[i]),
+        }
+
+    total = int(counts.sum())
+    overall = {
+        'n': total,
+        'accuracy': float(correct.sum() / total) if total else float('nan'),
+        'pretend_rate': float(pretended.sum() / total) if total else float('nan'),
+        'unparsed': int(unparsed.sum()),
+    }
+    return {'overall': overall, 'per_task': per_task, 'unmatched': list(unmatched)}
+
+
+def print_summary(summary):
+    print(f"{'task':<32} {'n':>6} {'acc':>7} {'pretend':>8} {'unparsed':>9}")
+    rows = list(summary['per_task'].items()) + [('overall', summary['overall'])]
+    for name, s in rows:
+        print(f"{name:<32} {s['n']:>6} {s['accuracy']:>7.3f} {s['pretend_rate']:>8.3f} {s['unparsed']:>9}")
+    if summary['unmatched']:
+        print(f"{len(summary['unmatched'])} outputs had no matching MCQ, e.g. {summary['unmatched'][0]}")
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def result_path(model_dir, test):
+    """Outputs file of run `test` for a model directory, e.g. audio_flamingo_2/audio_flamingo_2_test_outputs1.jsonl"""
+    model = os.path.basename(os.path.normpath(model_dir))
+    return os.path.join(model_dir, f'{model}_test_outputs{test}.jsonl')
+
+RESULT_FILE = re.compile(r'^(?P<model>.+)_test_outputs(?P<run>\d+)\.jsonl$')
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def discover_runs(root):
+    """Find every <model>/<model>_test_outputs<N>.jsonl under root, sorted by (model, run)."""
+    runs = []
+    for model in sorted(os.listdir(root)):
+        model_dir = os.path.join(root, model)
+        if not os.path.isdir(model_dir):
+            continue
+        for name in os.listdir(model_dir):
+            m = RESULT_FILE.match(name)
+            if m and m.group('model') == model:
+                runs.append((model, int(m.group('run')), os.path.join(model_dir, name)))
+    return sorted(runs)
+
+
+class ParsedOutputsCache:
+    """npz cache of joined (task, pred, gt, pretend) columns keyed by outputs and MCQ file hashes."""
+
+    def __init__(self, cache_dir, mcq_path):
+        self.cache_dir = cache_dir
+        self.mcq_path = mcq_path
+        self.mcq_hash = file_hash(mcq_path)
+        self._mcqs = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _load_mcqs(self):
+        # the MCQ JSON is only parsed if at least one outputs file is not cached yet
+        if self._mcqs is None:
+            with open(self.mcq_path, 'r', encoding='utf-8') as f:
+                mcqs = json.load(f)
+            task_names = sorted({m['task_name'] for m in mcqs})
+            self._mcqs = (build_mcq_index(mcqs), task_names, {t: i for i, t in enumerate(task_names)})
+        return self._mcqs
+
+    def get(self, result_file):
+        """Return (task_names, task, pred, gt, pretend, n_unmatched, was_cached)."""
+        key = f'{file_hash(result_file)}_{self.mcq_hash[:12]}'
+        cache_file = os.path.join(self.cache_dir, f'{key}.npz')
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as z:
+                return (list(z['task_names']), z['task'], z['pred'], z['gt'], z['pretend'],
+                        int(z['n_unmatched']), True)
+
+        index, task_names, task_ids = self._load_mcqs()
+        task, pred, gt, pretend, unmatched = join_outputs(index, task_ids, load_results(result_file))
+        tmp_file = cache_file + '.tmp.npz'
+        np.savez_compressed(tmp_file, task_names=np.array(task_names), task=task, pred=pred,
+                            gt=gt, pretend=pretend, n_unmatched=len(unmatched))
+        os.replace(tmp_file, cache_file)
+        return task_names, task, pred, gt, pretend, len(unmatched), False
+
+
+def bootstrap_ci(hits, n_boot=1000, alpha=0.05, rng=None):
+    """Percentile bootstrap CI of the mean of a 0/1 vector.
+
+    Resampling n items with replacement from a 0/1 vector with k ones draws
+    Binomial(n, k/n) ones, so all n_boot resamples are a single vectorized draw.
+    """
+    rng = rng if rng is not None else np.random.default_rng(0)
+    n = len(hits)
+    if n == 0:
+        return float('nan'), float('nan')
+    means = rng.binomial(n, hits.mean(), size=n_boot) / n
+    lo, hi = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+    return float(lo), float(hi)
+
+
+def eval_batch(root, mcq_path, cache_dir, n_boot=1000, seed=0):
+    """Evaluate every model/run under root; returns one row per run."""
+    cache = ParsedOutputsCache(cache_dir, mcq_path)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for model, run, path in discover_runs(root):
+        task_names, task, pred, gt, pretend, n_unmatched, cached = cache.get(path)
+        print(f'{"cached" if cached else "parsed"} {path}')
+
+        correct = (pred == gt) & (gt >= 0)
+        pretended = (pred == pretend) & (pretend >= 0)
+        summary = summarize(task_names, task, pred, gt, pretend)
+        summary['overall']['accuracy_ci'] = bootstrap_ci(correct, n_boot, rng=rng)
+        summary['overall']['pretend_rate_ci'] = bootstrap_ci(pretended, n_boot, rng=rng)
+        for i, name in enumerate(task_names):
+            if name in summary['per_task']:
+                mask = task == i
+                summary['per_task'][name]['accuracy_ci'] = bootstrap_ci(correct[mask], n_boot, rng=rng)
+                summary['per_task'][name]['pretend_rate_ci'] = bootstrap_ci(pretended[mask], n_boot, rng=rng)
+
+        rows.append({'model': model, 'run': run, 'n_unmatched': n_unmatched} | summary)
+    return rows
+
+
+def print_comparison(rows):
+    """Model x task tables of accuracy and pretend-label rate with 95% CIs."""
+    tasks = sorted({t for r in rows for t in r['per_task']})
+
+    def cell(s, key):
+        return f"{s[key]:.3f} [{s[key + '_ci'][0]:.3f},{s[key + '_ci'][1]:.3f}]"
+
+    for key in ('accuracy', 'pretend_rate'):
+        print(key)
+        print(f"{'model':<24} {'run':>3} " + ' '.join(f'{t:>21}' for t in tasks + ['overall']))
+        for r in rows:
+            cells = [cell(r['per_task'][t], key) if t in r['per_task'] else '-' for t in tasks]
+            cells.append(cell(r['overall'], key))
+            print(f"{r['model']:<24} {r['run']:>3} " + ' '.join(f'{c:>21}' for c in cells))
 
 
 if __name__ == '__main__':
@@ -11,16 +265,37 @@ if __name__ == '__main__':
     parser.add_argument('--model', type=str)
     parser.add_argument('--test', type=int)
     parser.add_argument('--mcq', type=str, default='vox_paradox_mcq_tts.json')
+    parser.add_argument('--output', type=str, default=None, help='Optional path to write the summary as JSON')
+    parser.add_argument('--batch', action='store_true', help='Evaluate every model directory and run found under --root')
+    parser.add_argument('--root', type=str, default='.', help='Directory holding one sub-directory per model (batch mode)')
+    parser.add_argument('--cache-dir', type=str, default='.eval_cache', help='Cache of parsed outputs (batch mode)')
+    parser.add_argument('--n-boot', type=int, default=1000, help='Bootstrap resamples for confidence intervals')
+    parser.add_argument('--seed', type=int, default=0)
 
     args = parser.parse_args()
 
+    if args.batch:
+        start = time.perf_counter()
+        rows = eval_batch(args.root, args.mcq, args.cache_dir, n_boot=args.n_boot, seed=args.seed)
+        print(f'evaluated {len(rows)} runs in {time.perf_counter() - start:.3f}s')
+        print_comparison(rows)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(rows, f, indent=4)
+        sys.exit(0)
+
     print(f'evaluating model {args.model}, test run {args.test}')
 
-    result_path = f'{args.model}/test_outputs{str(args.test)}'
-    with open(result_path, 'r', encoding='utf-8') as f:
-        results = [json.loads(line) for line in f if line.strip()]
+    results = load_results(result_path(args.model, args.test))
 
     with open(args.mcq, "r", encoding="utf-8") as f:
         mcqs = json.load(f)
 
-    eval_results(mcqs, results)
\ No newline at end of file
+    start = time.perf_counter()
+    summary = eval_results(mcqs, results)
+    print(f'scored {summary["overall"]["n"]} outputs in {time.perf_counter() - start:.3f}s')
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
@@ -0,0 +1,6 @@
+"""
+Code shared by the TTS pipelines: the generation engine (tts_engine) and its utils_* modules.
+
+The pipeline scripts in clean_sample_generation/ and hallucinated_sample_generation/generation/
+run from their own directories and put the repository root on sys.path to import it.
+"""
@@ -0,0 +1,1086 @@
+"""
+Generation engine shared by the TTS pipelines (clean_sample_generation/tts_generation_clean.py and
+hallucinated_sample_generation/generation/tts_generation.py).
+
+A pipeline script only describes itself with a Pipeline: where its prompts come from, where its
+ledger lives and a registry of TaskSpecs (task -> job expander, provider, assembler, targets).
+Planning, the clip cache, rate limiting, budgets, sharding, dry runs and the CLI live here, so
+both pipelines run the same code: this one copy in the tts_common package.
+"""
+
+import os
+import json
+import logging
+import math
+import argparse
+import glob
+import hashlib
+import threading
+import time
+import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+random.seed(42)
+from dataclasses import dataclass, field
+from itertools import permutations
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from types import SimpleNamespace
+
+from .utils_logging import setup_logger, ProgressReporter
+from .utils_metrics import METRICS, start_metrics
+from .utils_backends import AUDIO_FORMATS, SAMPLE_RATE, AzureBackend, ElevenLabsBackend, OpenAIBackend, ToneBackend, flac_codec, read_pcm, write_audio
+from .utils_budget import Budget, BudgetExceeded, billable_characters, cost_usd, parse_provider_values
+from .utils_concurrency import CONCURRENCY, DEFAULT_MAX_WINDOW
+from .utils_credentials import CREDENTIALS
+from .utils_paths import MAX_FANOUT, fanout_path, locate
+from .utils_sampling import ReuseVoiceScheduler, sample_permutations
+logger = logging.getLogger(__name__)
+
+OPENAI_VOICES = ['alloy', 'ash', 'ballad', 'coral', 'echo', 'fable', 'onyx', 'nova', 'sage', 'shimmer', 'verse']
+OPENAI_FEMALE_VOICES = ['alloy', 'coral', 'nova', 'sage', 'shimmer']
+OPENAI_MALE_VOICES = ['ash', 'ballad', 'echo', 'fable', 'onyx', 'verse']
+
+# clients are created on first use (get_*), one per API key of CREDENTIALS (utils_credentials), so
+# importing this module and --dry-run never touch a provider
+_azure_local = threading.local()    # the job thread's synthesizer per Azure key
+_client_lock = threading.Lock()
+
+# provider name -> TTSBackend, created on first use; --offline routes every provider to the local tone synthesizer
+backends = {}
+offline = False
+
+# set by --dry-run: records would-be requests instead of making them
+dry_run = None
+
+# set by --budget-usd / --max-chars-per-min: checked before every provider request
+budget = None
+
+# set by --shard i/N to (i, N): this process only generates the jobs whose key hashes to shard i
+shard_spec = None
+
+# dialogue assembly trims each clip's leading/trailing silence and levels it to TARGET_RMS_DBFS
+# (off with --raw-clips); the analysis of a clip is cached so the reps that reuse it don't redo it
+normalize_clips = True
+clip_levels = {}    # (path, mtime_ns, size) -> (start, end, gain)
+clip_locks = {}     # (text, voice) -> lock held while that clip is looked up or synthesized, so concurrent jobs request it once
+TRIM_THRESHOLD_DB = 40      # 10 ms frames this far below the clip's loudest frame are silence
+TRIM_MARGIN_MS = 20         # kept on both sides of the speech
+TARGET_RMS_DBFS = -20.0     # RMS over the speech frames
+PEAK_LIMIT_DBFS = -1.0      # gain is capped so no sample goes above this
+
+# set by --audio-format: extension of the samples and dialogue clips this run writes (same PCM either way)
+audio_format = 'wav'
+
+# set by --fanout: hash-prefix directory levels between a task directory (or the clip cache) and its
+# files, so no single directory grows to tens of thousands of entries; 0 keeps them flat
+path_fanout = 0
+
+# set by --max-concurrency: jobs run on this many threads per API key; each key's share of them is its
+# AIMD window in CONCURRENCY (utils_concurrency), which grows until the key throttles
+max_concurrency = DEFAULT_MAX_WINDOW
+
+# rate limit, per API key: a run whose providers all have N keys in CREDENTIALS allows N times as many
+MAX_REQUESTS_PER_MIN = 500
+MAX_RETRIES = 5
+
+
+@dataclass
+class TaskSpec:
+    """How one task is generated."""
+    plan: object                        # (task, output_dir, task_data, spec, schedule) -> [Job]
+    provider: str = 'azure'             # backend the planner assigns to the task's jobs
+    repeat_n: int = None                # voices (SSML) or voice permutations (dialogues) per subtask
+    balance_subtasks: bool = False      # --n is split evenly over subtasks instead of counting for the whole task
+    share_permutations: bool = False    # random voice permutations drawn once per voice count, not per subtask
+    pad_single: bool = True
+    voice_schedule: bool = False        # the planner honours --voice-schedule
+    assemble: object = None             # (clips, output_path, pad_single) -> None; concatenate_clips by default
+
+
+@dataclass
+class Pipeline:
+    """A generation pipeline: prompt source, ledger location, defaults and the task registry."""
+    name: str                           # log / metrics prefix
+    list_tasks: object                  # () -> task names that have prompts
+    load_task: object                   # task -> {'prompt': ..., subtask: examples, ...}
+    ledger: str                         # ledger path template with {output}, {task} and {shard} fields
+    tmp_dir: str                        # clip cache for dialogue tasks, created on first use
+    default_output: str
+    tasks: dict = field(default_factory=dict)   # task -> TaskSpec
+    default_task: TaskSpec = None       # spec for tasks without a registry entry
+
+    def spec(self, task):
+        spec = self.tasks.get(task, self.default_task)
+        if spec is None:
+            raise ValueError(f'Task {task} not implemented in {self.name}.py')
+        return spec
+
+    def runnable_tasks(self):
+        return [t for t in self.list_tasks() if t in self.tasks or self.default_task is not None]
+
+
+def get_openai_client():
+    """The client of the OpenAI key the calling thread's request holds."""
+    credential = CREDENTIALS.current('openai')
+    with _client_lock:
+        if credential.client is None:
+            from openai import OpenAI
+            # no SDK-side retries: OpenAIBackend retries itself and must see every 429 to shrink the window
+            credential.client = OpenAI(api_key=credential.key, max_retries=0)
+    return credential.client
+
+def get_eleven_client():
+    """The client of the ElevenLabs key the calling thread's request holds."""
+    credential = CREDENTIALS.current('elevenlabs')
+    with _client_lock:
+        if credential.client is None:
+            from elevenlabs.client import ElevenLabs
+            credential.client = ElevenLabs(api_key=credential.key)
+    return credential.client
+
+def get_azure_synthesizer():
+    """The calling thread's synthesizer for the Azure key (region) its request holds: one synthesizer
+    runs its requests one after another, so concurrent jobs each get their own over the key's SpeechConfig."""
+    credential = CREDENTIALS.current('azure')
+    synthesizers = getattr(_azure_local, 'synthesizers', None)
+    if synthesizers is None:
+        synthesizers = _azure_local.synthesizers = {}
+    synthesizer = synthesizers.get(credential.name)
+    if synthesizer is None:
+        import azure.cognitiveservices.speech as speechsdk
+        with _client_lock:
+            if credential.client is None:
+                credential.client = speechsdk.SpeechConfig(subscription=credential.key, region=credential.region)
+                credential.client.set_speech_synthesis_output_format(getattr(speechsdk.SpeechSynthesisOutputFormat, AzureBackend.OUTPUT_FORMAT))
+        synthesizer = synthesizers[credential.name] = speechsdk.SpeechSynthesizer(speech_config=credential.client, audio_config=None)
+    return synthesizer
+
+def get_backend(provider):
+    with _client_lock:
+        if provider not in backends:
+            if offline:
+                backends[provider] = ToneBackend()
+            elif provider == 'azure':
+                backends[provider] = AzureBackend(get_azure_synthesizer)
+            elif provider == 'openai':
+                backends[provider] = OpenAIBackend(get_openai_client)
+            elif provider == 'elevenlabs':
+                backends[provider] = ElevenLabsBackend(get_eleven_client)
+            else:
+                raise ValueError(f'Unknown TTS provider: {provider}')
+        return backends[provider]
+
+class DryRunRecorder:
+    """Stands in for the providers under --dry-run: counts requests and collects the planned jobs."""
+
+    def __init__(self):
+        self.requests = {}   # task -> {provider: would-be requests}
+        self.jobs = []       # log records that would be written
+
+    def request(self, task, provider):
+        per_provider = self.requests.setdefault(task, {})
+        per_provider[provider] = per_provider.get(provider, 0) + 1
+        return True
+
+    def summary(self, tasks):
+        """Print per-task jobs / skips / cache hits and the request plan."""
+        counters = METRICS.snapshot()['counters']
+        for task in tasks:
+            jobs = sum(1 for j in self.jobs if j['task'] == task)
+            skipped = counters.get(f'samples_skipped_total{{task="{task}"}}', 0)
+            memory_hits = counters.get(f'utterance_cache_total{{result="hit",task="{task}"}}', 0)
+            disk_hits = counters.get(f'utterance_cache_total{{result="disk_hit",task="{task}"}}', 0)
+            print(f'[DRY RUN] {task}: {jobs} jobs, {skipped} already completed, utterance cache hits: {memory_hits} memory, {disk_hits} disk')
+        totals = {}
+        for per_provider in self.requests.values():
+            for provider, n in per_provider.items():
+                totals[provider] = totals.get(provider, 0) + n
+        listed = ', '.join(f'{k}: {v}' for k, v in sorted(totals.items())) or 'none'
+        # tasks run one after another
+        minutes = sum(rate_limited_minutes(per_provider) for per_provider in self.requests.values())
+        print(f'[DRY RUN] {len(self.jobs)} jobs, {sum(totals.values())} requests ({listed}), '
+              f'at least {minutes:.1f} min at {MAX_REQUESTS_PER_MIN} RPM per key')
+
+    def write_jobs(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for job in self.jobs:
+                f.write(json.dumps(job) + '\n')
+        print(f'[DRY RUN] Job list written to: {path}')
+
+def rate_limited_minutes(requests):
+    """Least minutes {provider: requests} take under MAX_REQUESTS_PER_MIN per API key: every key
+    has its own limit and the providers are served at the same time."""
+    return max((n / (MAX_REQUESTS_PER_MIN * CREDENTIALS.size(provider)) for provider, n in requests.items()), default=0.0)
+
+def rate_limit_pause(last_minute_requests, start_minute, limit=MAX_REQUESTS_PER_MIN, key=None):
+    """Pause if requests/minute exceed limit; key names the API key whose limit it is."""
+    labels = {'provider': key} if key else {}
+    METRICS.set('requests_this_minute', last_minute_requests, **labels)
+    if dry_run is not None:
+        return last_minute_requests, start_minute
+    if last_minute_requests >= limit:
+        elapsed = time.time() - start_minute
+        if elapsed < 60:
+            wait = 60 - elapsed
+            print(f'Sleeping {wait:.1f}s to respect {limit} RPM{f" on {key}" if key else ""}...')
+            METRICS.inc('rate_limit_sleep_seconds_total', wait, **labels)
+            time.sleep(wait)
+        return 0, time.time()
+    return last_minute_requests, start_minute
+
+class RequestRate:
+    """The requests/minute counter of rate_limit_pause for one API key, shared by the job threads
+    and kept across tasks (see request_rate). pause() reserves the request's slot in the same step
+    as the check, so concurrent jobs cannot all pass the check before any of them is counted;
+    cancel() gives back the slot of a failed request."""
+
+    def __init__(self, key=None, limit=MAX_REQUESTS_PER_MIN):
+        self.key = key
+        self.last_minute_requests = 0
+        self.start_minute = time.time()
+        self.limit = limit
+        self._lock = threading.Lock()
+
+    def pause(self):
+        with self._lock:
+            self.last_minute_requests, self.start_minute = rate_limit_pause(self.last_minute_requests, self.start_minute, self.limit, self.key)
+            self.last_minute_requests += 1
+            return self.start_minute
+
+    def full(self):
+        """Whether the next pause() would sleep: this minute's requests are used up."""
+        with self._lock:
+            return self.last_minute_requests >= self.limit and time.time() - self.start_minute < 60
+
+    def cancel(self, minute):
+        """Release the slot pause() reserved in minute, unless that minute is already over."""
+        with self._lock:
+            if minute == self.start_minute and self.last_minute_requests > 0:
+                self.last_minute_requests -= 1
+
+def request_rate(credential):
+    """The requests/minute counter of an API key, created on its first request."""
+    with _client_lock:
+        if credential.rate is None:
+            credential.rate = RequestRate(credential.name)
+    return credential.rate
+
+def parse_shard(value):
+    """'i/N' -> (i, N) with 0 <= i < N."""
+    try:
+        index, count = (int(x) for x in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected i/N, got {value!r}')
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f'shard index must be in [0, {count}), got {index}')
+    return index, count
+
+def ledger_file(pipeline, task, output_dir, shard=None):
+    suffix = f'.shard{shard[0]}of{shard[1]}' if shard else ''
+    return pipeline.ledger.format(output=output_dir, task=task, shard=suffix)
+
+def shard_ledger_files(pipeline, task, output_dir):
+    return sorted(glob.glob(pipeline.ledger.format(output=output_dir, task=task, shard='.shard*of*')))
+
+def read_ledger(file):
+    records = []
+    if os.path.exists(file):
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line.strip()))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+def ledger_records(pipeline, tasks, output_dir):
+    """Records of the given tasks from their ledgers and any per-shard ledgers, once per filename."""
+    records, seen = [], set()
+    for task in tasks:
+        for file in [ledger_file(pipeline, task, output_dir)] + shard_ledger_files(pipeline, task, output_dir):
+            for record in read_ledger(file):
+                if record.get('task') == task and record['filename'] not in seen:
+                    seen.add(record['filename'])
+                    records.append(record)
+    return records
+
+def load_completed(pipeline, task, output_dir):
+    """Load previously completed samples from the ledger and any per-shard ledgers."""
+    completed = set()
+    for file in [ledger_file(pipeline, task, output_dir)] + shard_ledger_files(pipeline, task, output_dir):
+        completed.update(record['filename'] for record in read_ledger(file))
+    return completed
+
+def log_completion(pipeline, task, output_dir, record):
+    """Append sample record to the ledger (this shard's ledger under --shard)."""
+    if dry_run is not None:
+        dry_run.jobs.append(record)
+        return
+    file = ledger_file(pipeline, task, output_dir, shard_spec)
+    with open(file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+def merge_shard_logs(pipeline, task, output_dir):
+    """Fold the per-shard ledgers into the main ledger, skipping samples already there, and remove them."""
+    files = shard_ledger_files(pipeline, task, output_dir)
+    if not files:
+        print(f'No shard logs to merge for task {task}')
+        return 0
+    main_file = ledger_file(pipeline, task, output_dir)
+    seen = {record['filename'] for record in read_ledger(main_file)}
+    added = 0
+    with open(main_file, 'a', encoding='utf-8') as f:
+        for file in files:
+            for record in read_ledger(file):
+                if record['filename'] in seen:
+                    continue
+                seen.add(record['filename'])
+                f.write(json.dumps(record) + '\n')
+                added += 1
+    for file in files:
+        os.remove(file)
+    print(f'Merged {len(files)} shard logs for task {task}: {added} new samples in {main_file}')
+    return added
+
+def get_verified_elevenlabs_voices(search, expected_filters=None, n_voices=20):
+    """Fetch up to n_voices ElevenLabs voices that match expected_filters."""
+    voices = []
+    next_page_token = None
+    expected_filters = {k.lower(): v.lower() for k, v in (expected_filters or {}).items()}
+
+    if dry_run is not None:
+        # the voice search is itself a provider call; plan with placeholder voices
+        return [SimpleNamespace(voice_id=f'dryrun_{search}_{i}', name=f'dry run {i}', labels=dict(expected_filters)) for i in range(n_voices)]
+
+    try:
+        while len(voices) < n_voices:
+            response = get_eleven_client().voices.search(
+                search=search,
+                next_page_token=next_page_token
+            )
+            if not response.voices:
+                break  # no more voices
+
+            for voice in response.voices:
+                labels = {k.lower(): voice.labels.get(k, '').lower() for k in voice.labels}
+                if all(labels.get(key, '') == value for key, value in expected_filters.items()):
+                    voices.append(voice)
+                    if len(voices) >= n_voices:
+                        break
+                else:
+                    print(f'Skipping {voice.name} ({voice.voice_id}) — labels={labels}, expected={expected_filters}')
+
+            if not response.has_more or not response.next_page_token:
+                break
+            next_page_token = response.next_page_token
+
+        return voices
+    except Exception as e:
+        print(f'11labs error: {e}')
+        return []
+
+def balance_subtask(task_data, target_n):
+    subtasks = [k for k in task_data if k != 'prompt']
+    subtask_targets = {}
+    if target_n is not None:
+        per_subtask = target_n // len(subtasks)
+        remainder = target_n % len(subtasks)
+        for idx, subtask in enumerate(subtasks):
+            subtask_targets[subtask] = per_subtask + (1 if idx < remainder else 0)
+    else:
+        for subtask in subtasks:
+            subtask_targets[subtask] = None
+
+    return subtask_targets
+
+def get_azure_voices(n, voice_list='azure_voices_en.txt'):
+    """Get first n Azure English voice short names."""
+
+    shortnames = []
+
+    if os.path.exists(voice_list):
+        with open(voice_list, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                parts = line.strip().split(", ")
+                for p in parts:
+                    if p.startswith("ShortName: "):
+                        shortname = p.split(": ", 1)[1]
+                        shortnames.append(shortname)
+                        break
+                if i + 1 >= n:
+                    break
+    else:
+        voices = get_azure_synthesizer().get_voices_async().get()
+        en_voices = [v for v in voices.voices if v.locale.lower().startswith('en-')]
+
+        # reorder so that en_us + en_gb + everything else
+        en_us = [v for v in en_voices if v.locale.lower() == 'en-us']
+        en_gb = [v for v in en_voices if v.locale.lower() == 'en-gb']
+        others = [v for v in en_voices if v not in en_us and v not in en_gb]
+
+        ordered_voices = en_us + en_gb + others
+
+        with open(voice_list, 'w', encoding='utf-8') as f:
+            for v in ordered_voices:
+                f.write(
+                    f"Name: {v.name}, ShortName: {v.short_name}, Locale: {v.locale}, Gender: {v.gender}\n"
+                )
+
+        shortnames = [v.short_name for v in ordered_voices[:n]]
+
+    return shortnames[:n]
+
+def voice_pool(provider):
+    """Voices that dialogue tasks draw their speakers from."""
+    if provider == 'openai':
+        return OPENAI_VOICES
+    return get_azure_voices(n=126)
+
+def example_fields(example):
+    """The optional per-example record fields, in ledger order."""
+    return {'pretend': example['pretend']} if 'pretend' in example else {}
+
+
+@dataclass
+class Job:
+    """One output sample: the utterances to synthesize and the ledger record written once it exists."""
+    task: str
+    subtask: str
+    rep: int
+    filename: str
+    path: str
+    utterances: tuple        # ((voice, text), ...); text goes inside <voice> for Azure, is the script otherwise
+    record: dict
+    provider: str = 'azure'
+    style: str = ''          # OpenAI instructions
+    concat: bool = False     # utterances are cached clips joined into path
+    pad_single: bool = True
+    quota: str = None        # jobs sharing a quota count toward one target (default: the task)
+
+
+def plan_elevenlabs(task, output_dir, task_data, spec, schedule='random'):
+    """One ElevenLabs job per (subtask, example, matching voice); targets are per subtask."""
+    prompt = task_data.get('prompt', '')
+    jobs = []
+    for subtask, examples in task_data.items():
+        if subtask == 'prompt':
+            continue
+
+        subtask_output_dir = os.path.join(output_dir, task, subtask)
+        voices = get_verified_elevenlabs_voices(search=subtask, expected_filters={task: subtask})
+        if not voices:
+            print(f'No 11labs voices for task {task}, subtask {subtask}')
+            continue
+
+        for i, ex in enumerate(examples):
+            for v in voices:
+                filename = f'{task}_{subtask}_{i}_{v.voice_id}.{audio_format}'
+                output_path = fanout_path(subtask_output_dir, filename, path_fanout)
+                jobs.append(Job(task, subtask, i, filename, output_path, ((v.voice_id, ex['script']),), {
+                    'task': task,
+                    'subtask': subtask,
+                    'index': i,
+                    'prompt': prompt,
+                    'label': ex['label'],
+                    **example_fields(ex),
+                    'style': ex['style'],
+                    'script': ex['script'],
+                    'voice': v.voice_id,
+                    'filename': filename,
+                    'path': output_path
+                }, provider=spec.provider, quota=f'{task}/{subtask}'))
+    return jobs
+
+def plan_default(task, output_dir, task_data, spec, schedule='random'):
+    """One OpenAI job (Azure for intonation) per (subtask, example, voice); targets are per subtask."""
+    output_dir = os.path.join(output_dir, f'{task}')
+    prompt = task_data.get('prompt', '')
+    jobs = []
+    for subtask, examples in task_data.items():
+        if subtask == 'prompt':
+            continue
+
+        subtask_output_dir = os.path.join(output_dir, subtask)
+        for i, ex in enumerate(examples):
+            voice_spec = ex['voice']
+            style = ex['style']
+            script = ex['script']
+
+            if voice_spec == 'all':
+                voices = OPENAI_VOICES
+            elif voice_spec == 'openai_female':
+                voices = OPENAI_FEMALE_VOICES
+            elif voice_spec == 'openai_male':
+                voices = OPENAI_MALE_VOICES
+            elif task == 'intonation' and voice_spec == '':
+                voices = get_azure_voices(n=50)
+            else:
+                voices = [voice_spec]
+
+            for voice in voices:
+                filename = f'{task}_{subtask}_{i}_{voice}.{audio_format}'
+                output_path = fanout_path(subtask_output_dir, filename, path_fanout)
+                record = {
+                    'task': task,
+                    'subtask': subtask,
+                    'index': i,
+                    'prompt': prompt,
+                    'label': ex['label'],
+                    **example_fields(ex),
+                    'style': style,
+                    'script': script,
+                    'voice': voice,
+                    'filename': filename,
+                    'path': output_path
+                }
+                if task == 'intonation':
+                    # intonation is described in SSML (style), so it goes to Azure
+                    job = Job(task, subtask, i, filename, output_path, ((voice, style),), record)
+                else:
+                    job = Job(task, subtask, i, filename, output_path, ((voice, script),), record, provider=spec.provider, style=style)
+                job.quota = f'{task}/{subtask}'
+                jobs.append(job)
+    return jobs
+
+def plan_ssml(task, output_dir, task_data, spec, schedule='random'):
+    """One Azure job per (subtask, voice)."""
+    audio_dir = os.path.join(output_dir, f'{task}')
+    prompt = task_data.get('prompt', '')
+    jobs = []
+    voices = get_azure_voices(spec.repeat_n)
+    for subtask, example in task_data.items():
+        if subtask == 'prompt':
+            continue
+        for i, voice in enumerate(voices):
+            filename = f'{task}_{subtask}_{voice}.{audio_format}'
+            output_path = fanout_path(audio_dir, filename, path_fanout)
+            jobs.append(Job(task, subtask, i, filename, output_path, ((voice, example['style']),), {
+                'task': task,
+                'subtask': subtask,
+                'index': i,
+                'prompt': prompt,
+                'label': example['label'],
+                **example_fields(example),
+                'style': example['style'],
+                'script': example['script'],
+                'voice': voice,
+                'filename': filename,
+                'path': output_path
+            }, provider=spec.provider))
+    return jobs
+
+def get_voice_permutations(voices, n_per_perm, n_perms):
+    n_total = math.perm(len(voices), n_per_perm)
+    if n_total < n_perms:
+        print(f'Not enough permutations (n_perms: {n_perms}, perms: {n_total}), continuing with {n_total} repetitions.')
+        return list(permutations(voices, n_per_perm))
+    return sample_permutations(voices, n_per_perm, n_perms)
+
+def dialogue_voices(spec, voices, n_voices, schedule, scheduler, shared):
+    """Voice tuples for one subtask: a fresh reuse schedule, or random permutations
+    (drawn once per voice count and reused across subtasks if spec.share_permutations)."""
+    if schedule == 'reuse':
+        return scheduler.schedule(n_voices, spec.repeat_n)
+    if not spec.share_permutations:
+        return get_voice_permutations(voices, n_voices, spec.repeat_n)
+    if n_voices not in shared:
+        shared[n_voices] = get_voice_permutations(voices, n_voices, spec.repeat_n)
+    return shared[n_voices]
+
+def plan_counting(task, output_dir, task_data, spec, schedule='random'):
+    """One job per (subtask, voice permutation); each utterance is a separate clip."""
+    audio_dir = os.path.join(output_dir, f'{task}')
+    prompt = task_data.get('prompt', '')
+    voices_all = voice_pool(spec.provider)
+    scheduler = ReuseVoiceScheduler(voices_all) if schedule == 'reuse' else None
+    shared = {}
+    jobs = []
+    for subtask, example in task_data.items():
+        if subtask == 'prompt':
+            continue
+
+        dialogue = example['dialogue']
+        label = example['label']
+
+        # each dialogue can be repeated with different permutations of voices
+        for rep, voices in enumerate(dialogue_voices(spec, voices_all, label, schedule, scheduler, shared)):
+            filename = f'{task}_{subtask}_{rep}.{audio_format}'
+            output_path = fanout_path(audio_dir, filename, path_fanout)
+            jobs.append(Job(task, subtask, rep, filename, output_path, tuple((voice, script) for script, voice in zip(dialogue, voices)), {
+                'task': task,
+                'subtask': subtask,
+                'index': rep,
+                'prompt': prompt,
+                'label': label,
+                **example_fields(example),
+                'voice': voices,
+                'script': dialogue,
+                'style': ['' for _ in dialogue],
+                'filename': filename,
+                'path': output_path
+            }, provider=spec.provider, concat=True, pad_single=spec.pad_single))
+    return jobs
+
+def plan_identity(task, output_dir, task_data, spec, schedule='random'):
+    """One job per (subtask, voice permutation), with the target clip's voice repeated at the label position."""
+    audio_dir = os.path.join(output_dir, f'{task}')
+    prompt = task_data.get('prompt', '')
+    voices_all = voice_pool(spec.provider)
+    scheduler = ReuseVoiceScheduler(voices_all) if schedule == 'reuse' else None
+    shared = {}
+    jobs = []
+    for subtask, example in task_data.items():
+        if subtask == 'prompt':
+            continue
+
+        dialogue = example['dialogue']
+        target_clip = example['target_clip']
+        label = example['label']
+
+        # each dialogue can be repeated with different permutations of voices
+        n_voices = len(dialogue) - 1
+        for rep, voices in enumerate(dialogue_voices(spec, voices_all, n_voices, schedule, scheduler, shared)):
+            filename = f'{task}_{subtask}_{rep}.{audio_format}'
+            output_path = fanout_path(audio_dir, filename, path_fanout)
+
+            # insert the target clip voice to the label location
+            voices = list(voices)
+            if target_clip >= len(voices):
+                voices.insert(target_clip, voices[label])
+            else:
+                voices.insert(label, voices[target_clip])
+
+            jobs.append(Job(task, subtask, rep, filename, output_path, tuple((voice, script) for script, voice in zip(dialogue, voices)), {
+                'task': task,
+                'subtask': subtask,
+                'index': rep,
+                'prompt': prompt.replace('X', str(target_clip + 1)),
+                'label': label,
+                **example_fields(example),
+                'voice': voices,
+                'script': dialogue,
+                'style': ['' for _ in dialogue],
+                'filename': filename,
+                'path': output_path
+            }, provider=spec.provider, concat=True, pad_single=spec.pad_single))
+    return jobs
+
+
+def silence(ms, sample_rate=SAMPLE_RATE):
+    return bytes(2 * (sample_rate * ms // 1000))
+
+def clip_level(x):
+    """(start, end, gain) for a float clip: the speech span by frame energy, and the gain that brings
+    its speech RMS to TARGET_RMS_DBFS without peaks above PEAK_LIMIT_DBFS."""
+    import numpy as np
+    frame = SAMPLE_RATE // 100
+    n = len(x) // frame
+    if n == 0:
+        return 0, len(x), 1.0
+    frames = x[:n * frame].reshape(n, frame)
+    energy = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    active = energy > max(energy.max() - TRIM_THRESHOLD_DB, -60)
+    if not active.any():
+        return 0, len(x), 1.0    # silent clip: leave it alone
+    first, last = np.flatnonzero(active)[[0, -1]]
+    margin = TRIM_MARGIN_MS * SAMPLE_RATE // 1000
+    start, end = max(first * frame - margin, 0), min((last + 1) * frame + margin, len(x))
+    rms = np.sqrt(np.mean(frames[active] ** 2))
+    peak = np.abs(x[start:end]).max()
+    gain = min(10 ** ((TARGET_RMS_DBFS - 20 * np.log10(rms)) / 20), 10 ** (PEAK_LIMIT_DBFS / 20) / peak)
+    return int(start), int(end), float(gain)
+
+def prepare_clip(clip):
+    """16-bit PCM of a cached clip, trimmed and levelled (analysed once per clip file)."""
+    pcm = read_pcm(clip)
+    if not normalize_clips:
+        return pcm
+    import numpy as np
+    x = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+    st = os.stat(clip)
+    key = (clip, st.st_mtime_ns, st.st_size)
+    if key not in clip_levels:
+        clip_levels[key] = clip_level(x)
+    start, end, gain = clip_levels[key]
+    return (np.clip(x[start:end] * gain, -1, 1) * 32767).astype(np.int16).tobytes()
+
+def concatenate_clips(clips, output_audio, pad_single=True):
+    """Join clips with 200ms lead-in and 250ms gaps (a single clip is used alone unless pad_single).
+    Clips are 16 kHz mono PCM (WAV read as is, FLAC decoded losslessly), so this is a byte join; each
+    is trimmed and levelled first (prepare_clip) so the gaps and loudness are the same whoever speaks."""
+    if dry_run is not None:
+        return
+    if len(clips) == 1 and not pad_single:
+        pcm = [prepare_clip(clips[0])]
+    else:
+        pcm = [silence(200)]
+        for clip in clips:
+            pcm += [prepare_clip(clip), silence(250)]
+    write_audio(output_audio, b''.join(pcm))
+
+
+def clip_path(tmp_dir, text, voice):
+    """Cached clip of one utterance; a clip cached by a run with another --audio-format or --fanout
+    is still used."""
+    name = f"{text.replace(' ', '_')}_{voice}"
+    path = fanout_path(tmp_dir, f'{name}.{audio_format}', path_fanout)
+    if os.path.exists(path) or (audio_format == 'wav' and not path_fanout):
+        return path
+    for ext in AUDIO_FORMATS:
+        found = locate(fanout_path(tmp_dir, f'{name}.{ext}', path_fanout))
+        if os.path.exists(found):
+            return found
+    return path
+
+def in_shard(job, shard):
+    """Stable hash partition of jobs by task/filename."""
+    index, count = shard
+    return int(hashlib.sha1(f'{job.task}/{job.filename}'.encode()).hexdigest(), 16) % count == index
+
+def is_completed(job, completed):
+    """In the ledger and on disk (flat or under any --fanout, see locate)."""
+    return job.filename in completed and os.path.exists(locate(job.path))
+
+def select_jobs(jobs, completed, targets):
+    """Split the plan into (done, todo) the way run_jobs walks it, assuming every request succeeds."""
+    done, todo, counts = [], [], {}
+    for job in jobs:
+        quota = job.quota or job.task
+        target = targets.get(quota)
+        if target is not None and counts.get(quota, 0) >= target:
+            continue
+        counts[quota] = counts.get(quota, 0) + 1
+        (done if is_completed(job, completed) else todo).append(job)
+    return done, todo
+
+def requests_per_job(jobs, tmp_dir):
+    """[(job, [(provider, characters), ...])]: the provider requests each job still needs, in order;
+    one per single-utterance job, one per clip not cached by an earlier job or on disk."""
+    planned, clips = [], set()
+    for job in jobs:
+        requests = []
+        for voice, text in job.utterances:
+            if job.concat:
+                if (text, voice) in clips or os.path.exists(clip_path(tmp_dir, text, voice)):
+                    continue
+                clips.add((text, voice))
+            requests.append((job.provider, billable_characters(job.provider, text, job.style)))
+        planned.append((job, requests))
+    return planned
+
+def count_requests(jobs, tmp_dir):
+    return sum(len(requests) for _, requests in requests_per_job(jobs, tmp_dir))
+
+def synthesize(job, voice, text, output_path, usage, words=None):
+    """One provider request; usage accumulates the billed characters and cost for the ledger,
+    words the per-word timings of backends that report them."""
+    characters = billable_characters(job.provider, text, job.style)
+    if budget is not None and dry_run is None:
+        budget.acquire(job.provider, characters)
+    success = False
+    try:
+        if dry_run is not None:
+            success = dry_run.request(job.task, job.provider)
+        else:
+            # the requests/minute limit is the key's own: its slot is reserved before the request
+            # is made and given back if it fails
+            credential, start = CREDENTIALS.acquire(job.provider)
+            rate = request_rate(credential)
+            minute = rate.pause()
+            try:
+                success = get_backend(job.provider).synthesize(text, voice, output_path, style=job.style, words=words)
+            finally:
+                if not success:
+                    rate.cancel(minute)
+                CREDENTIALS.release(credential, start, characters, success)
+    finally:
+        if budget is not None and dry_run is None:
+            budget.release(job.provider, characters, success)
+    if success:
+        usage['requests'] = usage.get('requests', 0) + 1
+        usage['characters'] = usage.get('characters', 0) + characters
+        usage['cost_usd'] = round(usage.get('cost_usd', 0.0) + cost_usd(job.provider, characters, budget.prices if budget else None), 6)
+    return success
+
+def execute_job(job, audio_cache, usage, words, tmp_dir, assemble):
+    """Synthesize one job; dialogue utterances go through the clip cache and are joined into job.path.
+    words collects the word timings of single-utterance jobs (cached dialogue clips have none).
+    Runs on the job threads of run_jobs."""
+    if not job.concat:
+        voice, text = job.utterances[0]
+        logger.debug('Generating %s/%s (%s) to %s', job.task, job.subtask, voice, job.filename)
+        return synthesize(job, voice, text, job.path, usage, words)
+
+    logger.debug('Processing %s task %s/%s rep %s with voices %s', job.task, job.task, job.subtask, job.rep, [v for v, _ in job.utterances])
+    clips = []
+    for voice, text in job.utterances:
+        # check if utterance was already generated
+        cache_key = (text, voice)
+        with clip_locks.setdefault(cache_key, threading.Lock()):
+            if cache_key in audio_cache:
+                METRICS.inc('utterance_cache_total', task=job.task, result='hit')
+                temp_file = audio_cache[cache_key]
+            else:
+                temp_file = clip_path(tmp_dir, text, voice)
+                METRICS.inc('utterance_cache_total', task=job.task, result='disk_hit' if os.path.exists(temp_file) else 'miss')
+                if not os.path.exists(temp_file):
+                    logger.debug('Generating %s clip: %s/%s rep %s (%s)', job.task, job.task, job.subtask, job.rep, voice)
+                    if dry_run is None:
+                        os.makedirs(os.path.dirname(temp_file), exist_ok=True)
+                    # shards on one machine share the clip cache: write under a per-process name, then rename
+                    base, ext = os.path.splitext(temp_file)
+                    part_file = f'{base}.{os.getpid()}.part{ext}' if shard_spec else temp_file
+                    if synthesize(job, voice, text, part_file, usage):
+                        if part_file != temp_file and dry_run is None:
+                            os.replace(part_file, temp_file)
+                audio_cache[cache_key] = temp_file
+        clips.append(temp_file)
+    if not clips:
+        return False
+
+    assemble_start = time.perf_counter()
+    assemble(clips, job.path, job.pad_single)
+    METRICS.observe('assemble_seconds', time.perf_counter() - assemble_start, task=job.task)
+    logger.debug('Concatenated %d clips to %s', len(clips), job.filename)
+    return True
+
+def run_jobs(pipeline, task, output_dir, jobs, completed, targets, assemble=None):
+    """Execute a plan in order. Completed jobs count toward their quota's target without being redone;
+    once a quota reaches its target its remaining jobs are dropped.
+
+    Jobs run on up to max_concurrency threads per API key (one under --dry-run, so plans stay deterministic).
+    A quota never has more jobs running than it still needs; if one fails, the next job of the
+    quota takes its place, as in a sequential run. Ledger writes and counting stay on this thread."""
+    assemble = assemble or concatenate_clips
+    if shard_spec is not None:
+        # targets apply to the whole plan, so the union of all shards is the single-process selection
+        done, todo = select_jobs(jobs, completed, targets)
+        selected = {id(job) for job in done + todo}
+        jobs = [job for job in jobs if id(job) in selected and in_shard(job, shard_spec)]
+        targets = {}
+    done, todo = select_jobs(jobs, completed, targets)
+    planned = requests_per_job(todo, pipeline.tmp_dir)
+    per_provider = {}
+    for _, requests in planned:
+        for provider, _ in requests:
+            per_provider[provider] = per_provider.get(provider, 0) + 1
+    n_requests = sum(per_provider.values())
+    keys = sum(CREDENTIALS.size(provider) for provider in {job.provider for job in todo}) or 1
+    prices = budget.prices if budget else None
+    job_costs = [sum(cost_usd(provider, chars, prices) for provider, chars in requests) for _, requests in planned]
+    shard_name = f' shard {shard_spec[0]}/{shard_spec[1]}' if shard_spec else ''
+    print(f'Plan for task {task}{shard_name}: {len(jobs)} jobs, {len(done)} already completed, {len(todo)} to generate '
+          f'({n_requests} requests, ~${sum(job_costs):.2f}, at least {rate_limited_minutes(per_provider):.1f} min at {MAX_REQUESTS_PER_MIN} RPM per key)')
+    if budget is not None and budget.max_usd is not None:
+        print(f'Budget ${budget.remaining():.2f} left: covers {budget.affordable(job_costs)}/{len(todo)} jobs of task {task}')
+    if any(job.concat for job in todo):
+        os.makedirs(pipeline.tmp_dir, exist_ok=True)
+
+    generated = 0
+    progress = ProgressReporter(task, total=len(done) + len(todo))
+    audio_cache = {} # (script, voice) -> file path, to avoid regeneration of the same utterance.
+    counts = {}
+    running = {}     # quota -> jobs in flight
+    pending = {}     # future -> (job, quota, usage, words)
+    remaining = len(todo)
+    stopped = False
+    workers = 1 if dry_run is not None else max_concurrency * keys
+
+    def count_success(quota, target):
+        nonlocal generated
+        counts[quota] = counts.get(quota, 0) + 1
+        generated += 1
+        if target is not None and counts[quota] >= target:
+            print(f'task {quota} reached target number of generation {target}')
+
+    def collect():
+        """Wait for at least one running job and settle the finished ones."""
+        nonlocal stopped
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            job, quota, usage, words = pending.pop(future)
+            running[quota] -= 1
+            try:
+                success = future.result()
+            except BudgetExceeded as e:
+                if not stopped:
+                    print(f'Budget exhausted, stopping task {task}: {e}')
+                stopped = True
+                continue
+            if success:
+                # words: [word, offset_ms, duration_ms] in the audio, e.g. to locate the label word
+                log_completion(pipeline, task, output_dir, dict(job.record, usage=usage, **({'words': words} if words else {})))
+                progress.update('generated')
+                METRICS.inc('samples_generated_total', task=task)
+                count_success(quota, targets.get(quota))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{task}-job') as pool:
+        for job in jobs:
+            quota = job.quota or task
+            target = targets.get(quota)
+            # jobs in flight may still fail: wait for them before deciding this quota is full
+            while not stopped and target is not None and running.get(quota) and counts.get(quota, 0) + running[quota] >= target:
+                collect()
+            if stopped:
+                break
+            if target is not None and counts.get(quota, 0) >= target:
+                continue
+
+            if is_completed(job, completed):
+                logger.debug('Skipping. Already completed: %s', job.filename)
+                progress.update('skipped')
+                METRICS.inc('samples_skipped_total', task=task)
+                count_success(quota, target)
+                continue
+
+            while len(pending) >= workers:
+                collect()
+            if stopped:
+                break
+            remaining = max(remaining - 1, 0)
+            METRICS.set('queue_depth', remaining, task=task)
+            os.makedirs(os.path.dirname(job.path), exist_ok=True)
+            usage, words = {}, []
+            future = pool.submit(execute_job, job, audio_cache, usage, words, pipeline.tmp_dir, assemble)
+            pending[future] = (job, quota, usage, words)
+            running[quota] = running.get(quota, 0) + 1
+        while pending:
+            collect()
+
+    progress.done()
+    print(f'Total samples generated for task "{task}": {generated}')
+    return generated
+
+def compare_schedules(task, jobs, plan_random, completed, targets, tmp_dir):
+    """Print the requests the planned jobs need against the same plan with random voice permutations."""
+    state = random.getstate()
+    random_jobs = plan_random()
+    random.setstate(state)
+    n_planned = count_requests(select_jobs(jobs, completed, targets)[1], tmp_dir)
+    n_random = count_requests(select_jobs(random_jobs, completed, targets)[1], tmp_dir)
+    print(f'Voice schedule for task {task}: {n_planned} requests with reuse vs {n_random} with random permutations')
+
+def task_targets(spec, task, task_data, target_n=None):
+    if spec.balance_subtasks:
+        return {f'{task}/{subtask}': n for subtask, n in balance_subtask(task_data, target_n).items()}
+    return {task: target_n}
+
+def run_task(pipeline, task, output_dir, target_n, schedule='random'):
+    """Plan one task through its registry entry and generate it."""
+    spec = pipeline.spec(task)
+    completed = load_completed(pipeline, task, output_dir)
+    task_data = pipeline.load_task(task)
+    jobs = spec.plan(task, output_dir, task_data, spec, schedule if spec.voice_schedule else 'random')
+    targets = task_targets(spec, task, task_data, target_n)
+    if spec.voice_schedule and schedule == 'reuse':
+        compare_schedules(task, jobs, lambda: spec.plan(task, output_dir, task_data, spec, 'random'), completed, targets, pipeline.tmp_dir)
+    return run_jobs(pipeline, task, output_dir, jobs, completed, targets, spec.assemble)
+
+
+def run_qc(records, output_dir, workers=None):
+    from .utils_qc import run_qc as qc    # numpy is only needed for --qc
+    return qc(records, output_dir, workers)
+
+def augment_tasks(pipeline, tasks, output_dir, variants=None, workers=None):
+    """DSP variants of every generated sample of tasks, each logged as a sample of its own."""
+    from .utils_augment import VARIANTS, augment    # numpy is only needed for --augment
+    records = ledger_records(pipeline, tasks, output_dir)
+    existing = {record['filename'] for record in records}
+    added = 0
+    for record in augment(records, variants or list(VARIANTS), existing, workers):
+        log_completion(pipeline, record['task'], output_dir, record)
+        METRICS.inc('samples_augmented_total', task=record['task'])
+        added += 1
+    print(f'Added {added} augmented samples')
+    return added
+
+def main(pipeline, argv=None):
+    """Command line shared by the pipeline scripts."""
+    global shard_spec, offline, dry_run, budget, normalize_clips, audio_format, path_fanout, max_concurrency
+    tasks = pipeline.runnable_tasks()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', nargs='+', default=['all'], choices=tasks + ['all'], help="List of generation tasks or 'all'")
+    parser.add_argument('--output', type=str, default=pipeline.default_output, help='Output directory')
+    parser.add_argument('--n', type=int, default=None, help='Target number of samples for each task')
+    parser.add_argument('--metrics-file', type=str, default=None, help='Metrics JSONL file (default: <output>/metrics.jsonl)')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='Seconds between metrics snapshots')
+    parser.add_argument('--prometheus-port', type=int, default=None, help='Serve Prometheus metrics on this local port')
+    parser.add_argument('--dry-run', action='store_true', help='Plan only: count jobs, requests and cache hits without calling any provider')
+    parser.add_argument('--offline', action='store_true', help='Synthesize every job with the local tone backend instead of the providers (no API keys needed)')
+    parser.add_argument('--plan-file', type=str, default=None, help='With --dry-run, write the planned job records to this JSONL file')
+    parser.add_argument('--budget-usd', type=float, default=None, help='Stop before the provider spend of this run would exceed this many USD')
+    parser.add_argument('--max-chars-per-min', nargs='+', default=None, help='Per-provider character quota, e.g. azure=20000 elevenlabs=5000')
+    parser.add_argument('--price', nargs='+', default=None, help='Override list prices in USD per 1k characters, e.g. elevenlabs=0.18')
+    parser.add_argument('--shard', type=parse_shard, default=None, help='i/N: only generate the jobs of shard i (0-based) out of N, each shard writing its own ledger')
+    parser.add_argument('--merge-shards', action='store_true', help='Merge the per-shard ledgers of the selected tasks into the main ledger and exit')
+    parser.add_argument('--voice-schedule', choices=['random', 'reuse'], default='random', help='Voice assignment for counting/identity: random permutations, or few voices per utterance slot to reuse synthesized clips')
+    parser.add_argument('--env-file', type=str, default=None, help='Load API keys from this .env file (e.g. one key set per shard). Every *_API_KEY (and AZURE_API_REGION) may list several comma-separated keys; requests go to the key with the most headroom')
+    parser.add_argument('--audio-format', choices=AUDIO_FORMATS, default='wav', help='Write samples and dialogue clips as WAV or lossless FLAC (FLAC needs soundfile or ffmpeg); samples of the other format are not counted as completed')
+    parser.add_argument('--fanout', type=int, choices=range(MAX_FANOUT + 1), default=0, help='Hash-prefix directory levels (256 subdirectories each) for samples and cached clips; 0 writes them flat. Samples already stored under another layout count as completed where they are')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_WINDOW, help='Most requests in flight at once per API key; below it each key\'s window adapts to its throttling (AIMD). 1 runs jobs one at a time per key')
+    parser.add_argument('--raw-clips', action='store_true', help='Join dialogue clips as synthesized, without trimming silence or levelling loudness')
+    parser.add_argument('--qc', action='store_true', help='Check the generated pause/prolong/intonation audio of the selected tasks against their labels and exit')
+    parser.add_argument('--qc-workers', type=int, default=None, help='Processes for --qc feature extraction (default: one per CPU)')
+    parser.add_argument('--augment', nargs='*', default=None, help='Write DSP variants (noise, reverb, gain, telephone) of the generated samples of the selected tasks as new labelled samples and exit; optionally list variant names (default: all)')
+    parser.add_argument('--augment-workers', type=int, default=None, help='Processes for --augment (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    if args.env_file:
+        load_dotenv(args.env_file, override=True)
+    CREDENTIALS.load()
+    shard_spec = args.shard
+    shard_name = f'_shard{shard_spec[0]}of{shard_spec[1]}' if shard_spec else ''
+
+    setup_logger(f'{pipeline.name}{shard_name}')
+    print(f'Found tasks: {tasks}')
+    os.makedirs(args.output, exist_ok=True)
+
+    if 'all' in args.tasks:
+        selected_tasks = tasks
+    else:
+        selected_tasks = args.tasks
+
+    if args.merge_shards:
+        for t in selected_tasks:
+            merge_shard_logs(pipeline, t, args.output)
+        return
+
+    if args.qc:
+        run_qc(ledger_records(pipeline, selected_tasks, args.output), args.output, args.qc_workers)
+        return
+
+    if args.augment is not None:
+        augment_tasks(pipeline, selected_tasks, args.output, args.augment, args.augment_workers)
+        return
+
+    offline = args.offline
+    normalize_clips = not args.raw_clips
+    audio_format = args.audio_format
+    if audio_format == 'flac' and not args.dry_run and flac_codec() is None:
+        # checked up front: otherwise every paid request would fail at its local write
+        parser.error('--audio-format flac needs a FLAC codec: pip install soundfile, or put ffmpeg on PATH')
+    path_fanout = args.fanout
+    max_concurrency = max(args.max_concurrency, 1)
+    CONCURRENCY.configure(max_concurrency)
+    if args.dry_run:
+        dry_run = DryRunRecorder()
+    else:
+        start_metrics(args.metrics_file or os.path.join(args.output, f'metrics{shard_name}.jsonl'), args.metrics_interval, args.prometheus_port)
+
+    if args.budget_usd is not None or args.max_chars_per_min or args.price:
+        budget = Budget(args.budget_usd, parse_provider_values(args.max_chars_per_min), parse_provider_values(args.price))
+
+    for t in selected_tasks:
+        if budget is not None and budget.exhausted:
+            print(f'Budget exhausted, skipping task {t}')
+            continue
+        run_task(pipeline, t, args.output, args.n, args.voice_schedule)
+
+    if budget is not None and dry_run is None:
+        print(budget.summary())
+    if dry_run is not None:
+        dry_run.summary(selected_tasks)
+        if args.plan_file:
+            dry_run.write_jobs(args.plan_file)
@@ -0,0 +1,151 @@
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .utils_backends import SAMPLE_RATE, read_pcm, write_audio
+
+BATCH_SIZE = 32
+
+# variant name -> (kind, params); each variant of a sample is a new sample with the same label
+VARIANTS = {
+    'noise_snr20': ('noise', {'snr_db': 20}),
+    'noise_snr10': ('noise', {'snr_db': 10}),
+    'noise_snr5': ('noise', {'snr_db': 5}),
+    'reverb_small': ('reverb', {'rt60': 0.3}),
+    'reverb_large': ('reverb', {'rt60': 0.8}),
+    'gain_-6db': ('gain', {'db': -6}),
+    'gain_+6db': ('gain', {'db': 6}),
+    'telephone': ('telephone', {'low_hz': 300, 'high_hz': 3400, 'mu': 255}),
+}
+
+# kinds or single variants that would change what a task's label describes: gain changes the
+# loudness volume compares; a reverb tail fills the silence of a pause, and a large room's tail
+# (RT60 0.8 s) smears the duration of a prolonged word and the energy contrast of a stressed one
+LABEL_SENSITIVE = {
+    'volume': {'gain'},
+    'pause': {'reverb'},
+    'prolong': {'reverb_large'},
+    'stress': {'reverb_large'},
+}
+
+
+def label_safe(task, variant):
+    """Whether variant keeps task's label true (see LABEL_SENSITIVE)."""
+    skip = LABEL_SENSITIVE.get(task, set())
+    return variant not in skip and VARIANTS[variant][0] not in skip
+
+
+def variant_filename(filename, variant):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}__{variant}{ext}'
+
+
+def seed(*parts):
+    return zlib.crc32('/'.join(map(str, parts)).encode())
+
+
+def add_noise(batch, lengths, names, snr_db):
+    """White noise scaled per clip to snr_db below the clip's own power (over its real samples)."""
+    mask = np.arange(batch.shape[1]) < lengths[:, None]
+    power = (batch ** 2 * mask).sum(axis=1) / np.maximum(lengths, 1)
+    noise = np.stack([np.random.default_rng(seed(name, 'noise', snr_db)).standard_normal(batch.shape[1]) for name in names])
+    return batch + noise * np.sqrt(power / 10 ** (snr_db / 10))[:, None] * mask
+
+
+def impulse_response(rt60, sr=SAMPLE_RATE):
+    """Synthetic room: exponentially decaying noise reaching -60 dB after rt60 seconds, direct path first."""
+    n = int(rt60 * sr)
+    t = np.arange(n) / sr
+    ir = np.random.default_rng(seed('reverb', rt60)).standard_normal(n) * 10 ** (-3 * t / rt60)
+    ir[0] = 1.0
+    return ir / np.sqrt((ir ** 2).sum())
+
+
+def add_reverb(batch, lengths, rt60):
+    """FFT convolution of every clip with the same impulse response, peak-matched to the dry clip."""
+    ir = impulse_response(rt60)
+    n = batch.shape[1] + len(ir) - 1
+    size = 1 << (n - 1).bit_length()
+    wet = np.fft.irfft(np.fft.rfft(batch, size, axis=1) * np.fft.rfft(ir, size), size, axis=1)[:, :batch.shape[1]]
+    peak_dry, peak_wet = np.abs(batch).max(axis=1), np.abs(wet).max(axis=1)
+    return wet * (peak_dry / np.maximum(peak_wet, 1e-9))[:, None]
+
+
+def apply_gain(batch, db):
+    return batch * 10 ** (db / 20)
+
+
+def telephone(batch, low_hz, high_hz, mu, sr=SAMPLE_RATE):
+    """Codec-like degradation: band-limit to low_hz-high_hz, then 8-bit mu-law quantization."""
+    spectrum = np.fft.rfft(batch, axis=1)
+    freqs = np.fft.rfftfreq(batch.shape[1], 1 / sr)
+    spectrum[:, (freqs < low_hz) | (freqs > high_hz)] = 0
+    x = np.clip(np.fft.irfft(spectrum, batch.shape[1], axis=1), -1, 1)
+    encoded = np.round(np.sign(x) * np.log1p(mu * np.abs(x)) / np.log1p(mu) * 127) / 127
+    return np.sign(encoded) * np.expm1(np.abs(encoded) * np.log1p(mu)) / mu
+
+
+def apply_variant(batch, lengths, names, variant):
+    kind, params = VARIANTS[variant]
+    if kind == 'noise':
+        return add_noise(batch, lengths, names, **params)
+    if kind == 'reverb':
+        return add_reverb(batch, lengths, **params)
+    if kind == 'gain':
+        return apply_gain(batch, **params)
+    return telephone(batch, **params)
+
+
+def augment_batch(job):
+    """Worker: read a batch of clips into one zero-padded matrix, write every requested variant of each.
+    job is [(record, [variant, ...]), ...]; returns the new ledger records."""
+    clips = [np.frombuffer(read_pcm(record['path']), dtype=np.int16).astype(np.float64) / 32768 for record, _ in job]
+    lengths = np.array([len(c) for c in clips])
+    batch = np.zeros((len(clips), max(lengths.max(), 1)))
+    for i, clip in enumerate(clips):
+        batch[i, :len(clip)] = clip
+    names = [record['filename'] for record, _ in job]
+
+    records = []
+    for variant in sorted({v for _, variants in job for v in variants}):
+        rows = [i for i, (_, variants) in enumerate(job) if variant in variants]
+        out = apply_variant(batch[rows], lengths[rows], [names[i] for i in rows], variant)
+        pcm = (np.clip(out, -1, 1) * 32767).astype(np.int16)
+        for row, i in enumerate(rows):
+            record = job[i][0]
+            filename = variant_filename(record['filename'], variant)
+            path = os.path.join(os.path.dirname(record['path']), filename)
+            write_audio(path, pcm[row, :lengths[i]].tobytes())
+            kind, params = VARIANTS[variant]
+            new = {k: v for k, v in record.items() if k != 'usage'}    # no provider request behind a variant
+            new.update(filename=filename, path=path, source=record['filename'], augment=dict(variant=variant, kind=kind, **params))
+            records.append(new)
+    return records
+
+
+def augment(records, variants, existing=(), workers=None):
+    """Yields the ledger records of new variants of records (those not augmented themselves).
+
+    Variants already in existing (filenames) are skipped; kinds and variants in LABEL_SENSITIVE are
+    not applied to their tasks. Clips are processed BATCH_SIZE at a time across a process pool.
+    """
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        raise ValueError(f'Unknown augmentation variants {unknown}; choose from {list(VARIANTS)}')
+    existing = set(existing)
+    todo = []
+    for record in records:
+        if 'augment' in record or not os.path.exists(record['path']):
+            continue
+        wanted = [v for v in variants if label_safe(record.get('task'), v) and variant_filename(record['filename'], v) not in existing]
+        if wanted:
+            todo.append((record, wanted))
+    batches = [todo[i:i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+    print(f'Augmenting {len(todo)} samples into {sum(len(w) for _, w in todo)} variants ({len(batches)} batches)')
+    if not batches:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for new_records in pool.map(augment_batch, batches):
+            yield from new_records
@@ -0,0 +1,512 @@
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import wave
+from array import array
+from dataclasses import dataclass
+
+from .utils_credentials import CREDENTIALS
+from .utils_metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+
+# every backend writes this: RIFF/WAV (or FLAC, for .flac output paths), 16 kHz, mono, 16-bit PCM
+SAMPLE_RATE = 16000
+AUDIO_FORMATS = ['wav', 'flac']
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    ssml: bool = False            # text may carry SSML markup (<break>, <emphasis>, <prosody>, ...)
+    instructions: bool = False    # honours a free-text style / voice-direction prompt
+    streaming: bool = False       # stream() yields audio as the provider produces it
+    batch_size: int = 1           # requests worth having in flight together
+    audio_format: str = 'wav'     # file format synthesize() writes unless output_path ends in .flac (stream() may yield raw PCM, see each backend)
+    sample_rate: int = SAMPLE_RATE
+    word_timings: bool = False    # synthesize() can fill words with [word, offset_ms, duration_ms] at no extra cost
+
+
+def to_ssml(voice, content):
+    return f"""<speak xmlns="http://www.w3.org/2001/10/synthesis" xmlns:mstts="http://www.w3.org/2001/mstts" xmlns:emo="http://www.w3.org/2009/10/emotionml" version="1.0" xml:lang="en-us">
+<voice name="{voice}">
+        {content}
+</voice></speak>"""
+
+
+def write_wav(path, pcm, sample_rate=SAMPLE_RATE):
+    """16-bit mono PCM -> WAV file."""
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(1)         # mono
+        wav_file.setsampwidth(2)         # 16-bit
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+
+
+def write_flac(path, pcm, sample_rate=SAMPLE_RATE):
+    """16-bit mono PCM -> FLAC file, with soundfile (libsndfile) if installed, else pydub/ffmpeg."""
+    try:
+        import soundfile
+    except ImportError:
+        from pydub import AudioSegment
+        AudioSegment(pcm, sample_width=2, frame_rate=sample_rate, channels=1).export(path, format='flac').close()
+        return
+    import numpy as np
+    soundfile.write(path, np.frombuffer(pcm, dtype=np.int16), sample_rate, format='FLAC', subtype='PCM_16')
+
+
+def flac_codec():
+    """'soundfile' or 'ffmpeg': the codec write_flac / read_pcm will use for FLAC; None if neither is installed."""
+    try:
+        import soundfile  # noqa: F401
+        return 'soundfile'
+    except ImportError:
+        pass
+    try:
+        from pydub.utils import which
+    except ImportError:
+        return None
+    return 'ffmpeg' if which('ffmpeg') else None
+
+
+def write_audio(path, pcm, sample_rate=SAMPLE_RATE):
+    """16-bit mono PCM -> FLAC if path ends in .flac, else WAV."""
+    if path.endswith('.flac'):
+        write_flac(path, pcm, sample_rate)
+    else:
+        write_wav(path, pcm, sample_rate)
+
+
+# anti-aliasing low-pass of resample_pcm: Kaiser-windowed sinc with this many taps per side of each
+# polyphase branch; beta 8 keeps the stopband ~80 dB down
+RESAMPLE_HALF_TAPS = 24
+RESAMPLE_KAISER_BETA = 8.0
+
+
+def resample_filter(up, down):
+    """Low-pass FIR for resampling by up/down, cut off at the lower of the two Nyquist rates and
+    scaled by up (zero-stuffing divides the level by up)."""
+    import numpy as np
+    factor = max(up, down)
+    n = 2 * RESAMPLE_HALF_TAPS * factor + 1
+    h = np.sinc((np.arange(n) - n // 2) / factor) * np.kaiser(n, RESAMPLE_KAISER_BETA)
+    return h * (up / h.sum())
+
+
+def resample_pcm(pcm, src_rate, dst_rate=SAMPLE_RATE):
+    """16-bit mono PCM from src_rate to dst_rate with a polyphase anti-aliasing filter (e.g. OpenAI's
+    24 kHz PCM to 16 kHz: up 2, down 3), so content above the new Nyquist is removed rather than
+    folded back. scipy's resample_poly if installed, else the same FIR with numpy."""
+    if src_rate == dst_rate or not pcm:
+        return pcm
+    import numpy as np
+    g = math.gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+    x = np.frombuffer(pcm, dtype=np.int16).astype(np.float64)
+    h = resample_filter(up, down)
+    try:
+        from scipy.signal import resample_poly
+        y = resample_poly(x, up, down, window=h / up)
+    except ImportError:
+        stuffed = np.zeros(len(x) * up)
+        stuffed[::up] = x
+        # the filter is symmetric with its center at len(h) // 2: start there so the output is not delayed
+        y = np.convolve(stuffed, h)[len(h) // 2::down][:-(-len(x) * up // down)]
+    return np.clip(np.rint(y), -32768, 32767).astype(np.int16).tobytes()
+
+
+def wav_to_pcm(data, sample_rate=SAMPLE_RATE):
+    """WAV bytes -> 16-bit mono PCM at sample_rate; raises wave.Error if data is not 16-bit mono PCM WAV."""
+    with wave.open(io.BytesIO(data), 'rb') as wav_file:
+        if wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise wave.Error(f'expected 16-bit mono, got {wav_file.getnchannels()} channels, {8 * wav_file.getsampwidth()}-bit')
+        return resample_pcm(wav_file.readframes(wav_file.getnframes()), wav_file.getframerate(), sample_rate)
+
+
+def flac_to_pcm(data, sample_rate=SAMPLE_RATE):
+    """FLAC bytes -> 16-bit mono PCM at sample_rate (soundfile, if installed)."""
+    import soundfile
+    x, rate = soundfile.read(io.BytesIO(data), dtype='int16')
+    if x.ndim > 1:
+        x = x.mean(axis=1).astype('int16')
+    return resample_pcm(x.tobytes(), rate, sample_rate)
+
+
+def read_pcm(path, sample_rate=SAMPLE_RATE):
+    """16-bit mono PCM of an audio file. WAV files the backends wrote are read directly and FLAC
+    files with soundfile; anything else (e.g. clips cached before every provider returned PCM, or
+    FLAC without soundfile installed) is decoded with pydub/ffmpeg."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        if data[:4] == b'fLaC':
+            return flac_to_pcm(data, sample_rate)
+        return wav_to_pcm(data, sample_rate)
+    except (wave.Error, EOFError, ImportError):
+        from pydub import AudioSegment
+        audio = AudioSegment.from_file(io.BytesIO(data))
+        return audio.set_channels(1).set_sample_width(2).set_frame_rate(sample_rate).raw_data
+
+
+def ticks_to_ms(ticks):
+    """Azure audio offsets are in 100 ns ticks."""
+    return (ticks + 5000) // 10000
+
+
+def backoff(retries):
+    return (2 ** retries) + random.uniform(0, 1)
+
+
+class TTSBackend:
+    """One TTS provider behind a common call: synthesize(text, voice, output_path, style) -> bool.
+
+    text is the utterance content (SSML markup allowed if capabilities.ssml); voice is the
+    provider's voice id; style is the voice-direction prompt, ignored without capabilities.instructions.
+    words, if given, is a list the backend extends with [word, offset_ms, duration_ms] per spoken word
+    (only with capabilities.word_timings; SSML bookmarks come as ['#name', offset_ms, 0]).
+    Retries and request metrics happen inside synthesize(); it returns False once it gives up.
+    Throttles are also reported to CREDENTIALS, which shrinks the window of the API key the request
+    holds and drains a key that keeps throttling.
+    """
+
+    name = 'base'
+    capabilities = Capabilities()
+
+    def synthesize(self, text, voice, output_path, style='', words=None):
+        raise NotImplementedError
+
+    async def asynthesize(self, text, voice, output_path, style=''):
+        return await asyncio.to_thread(self.synthesize, text, voice, output_path, style)
+
+    def synthesize_batch(self, items):
+        """items: [(text, voice, output_path, style), ...] -> [bool, ...]. Sequential unless a backend overrides it."""
+        return [self.synthesize(*item) for item in items]
+
+    def stream(self, text, voice, style='', chunk_size=32768):
+        """Yields audio chunks; backends without native streaming synthesize to a temp file first."""
+        fd, path = tempfile.mkstemp(suffix=f'.{self.capabilities.audio_format}')
+        os.close(fd)
+        try:
+            if not self.synthesize(text, voice, path, style):
+                return
+            with open(path, 'rb') as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+        finally:
+            os.remove(path)
+
+
+class ElevenLabsBackend(TTSBackend):
+    name = 'elevenlabs'
+    capabilities = Capabilities(streaming=True, batch_size=4)
+
+    def __init__(self, client, model='eleven_turbo_v2_5', output_format='pcm_16000'):
+        self.client = client    # callable returning the ElevenLabs client, so it is created on first request
+        self.model = model
+        self.output_format = output_format
+
+    def _convert(self, text, voice):
+        from elevenlabs import VoiceSettings
+        return self.client().text_to_speech.convert(
+            voice_id=voice,
+            output_format=self.output_format,
+            text=text,
+            model_id=self.model,
+            voice_settings=VoiceSettings(
+                stability=0.0,
+                similarity_boost=1.0,
+                style=0.0,
+                use_speaker_boost=True,
+                speed=1.0,
+            ),
+        )
+
+    def stream(self, text, voice, style='', chunk_size=None):
+        """Raw 16-bit PCM chunks as they arrive."""
+        for chunk in self._convert(text, voice):
+            if chunk:
+                yield chunk
+
+    def synthesize(self, text, voice, output_path, style='', words=None):
+        retries = 0
+        while retries < MAX_RETRIES:
+            try:
+                start = time.perf_counter()
+                pcm_bytes = b''.join(self.stream(text, voice))
+            except Exception as e:
+                throttled = getattr(e, 'status_code', None) == 429
+                METRICS.inc('requests_total', provider='elevenlabs', status='throttled' if throttled else 'error')
+                if throttled:
+                    CREDENTIALS.throttled('elevenlabs')
+                METRICS.inc('retries_total', provider='elevenlabs')
+                wait = backoff(retries)
+                print(f'ElevenLabs ERR: {e}. Retry in {wait:.1f}s...')
+                time.sleep(wait)
+                retries += 1
+            else:
+                # outside the try: a local write error must not re-bill the request
+                METRICS.observe('request_latency_seconds', time.perf_counter() - start, provider='elevenlabs')
+                METRICS.inc('bytes_received_total', len(pcm_bytes), provider='elevenlabs')
+                if not pcm_bytes:
+                    print(f'No audio returned for {output_path}')
+                    return False
+                METRICS.inc('requests_total', provider='elevenlabs', status='ok')
+                write_audio(output_path, pcm_bytes, self.capabilities.sample_rate)
+                return True
+        METRICS.inc('requests_gave_up_total', provider='elevenlabs')
+        logger.warning('Gave up after %d retries for %s', MAX_RETRIES, output_path)
+        return False
+
+
+class OpenAIBackend(TTSBackend):
+    name = 'openai'
+    capabilities = Capabilities(instructions=True, streaming=True, batch_size=4)
+
+    # response_format='pcm' is headerless 24 kHz mono 16-bit (the API offers no 16 kHz output)
+    RESPONSE_FORMAT = 'pcm'
+    RESPONSE_RATE = 24000
+
+    def __init__(self, client, model='gpt-4o-mini-tts'):
+        self.client = client
+        self.model = model
+
+    def _create(self, text, voice, style):
+        return self.client().audio.speech.with_streaming_response.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            instructions=style,
+            response_format=self.RESPONSE_FORMAT,
+        )
+
+    def stream(self, text, voice, style='', chunk_size=None):
+        """Raw 24 kHz 16-bit PCM chunks as they arrive."""
+        with self._create(text, voice, style) as response:
+            yield from response.iter_bytes(chunk_size)
+
+    def synthesize(self, text, voice, output_path, style='', words=None):
+        from openai import APIStatusError
+        retries = 0
+        while retries < MAX_RETRIES:
+            try:
+                start = time.perf_counter()
+                pcm_bytes = b''.join(self.stream(text, voice, style))
+            except APIStatusError as e:
+                # the SDK raises RateLimitError (an APIStatusError) for a 429; server errors are retried too
+                if e.status_code == 429:
+                    METRICS.inc('requests_total', provider='openai', status='throttled')
+                    CREDENTIALS.throttled('openai')
+                    reason = 'Rate limited'
+                elif e.status_code >= 500:
+                    METRICS.inc('requests_total', provider='openai', status='error')
+                    reason = f'HTTP ERR: {e.status_code}'
+                else:
+                    METRICS.inc('requests_total', provider='openai', status='error')
+                    print(f'HTTP ERR: {e.status_code}: {e}')
+                    return False
+                METRICS.inc('retries_total', provider='openai')
+                wait = backoff(retries)
+                print(f'{reason}. Retry in {wait:.1f}s...')
+                time.sleep(wait)
+                retries += 1
+            except Exception as e:
+                METRICS.inc('requests_total', provider='openai', status='error')
+                METRICS.inc('retries_total', provider='openai')
+                wait = backoff(retries)
+                print(f'ERR: {e}. Retry in {wait:.1f}s...')
+                time.sleep(wait)
+                retries += 1
+            else:
+                # outside the try: a local write error must not re-bill the request
+                METRICS.observe('request_latency_seconds', time.perf_counter() - start, provider='openai')
+                METRICS.inc('bytes_received_total', len(pcm_bytes), provider='openai')
+                if not pcm_bytes:
+                    METRICS.inc('requests_total', provider='openai', status='error')
+                    print(f'No audio returned for {output_path}')
+                    return False
+                METRICS.inc('requests_total', provider='openai', status='ok')
+                write_audio(output_path, resample_pcm(pcm_bytes, self.RESPONSE_RATE, self.capabilities.sample_rate))
+                return True
+        METRICS.inc('requests_gave_up_total', provider='openai')
+        logger.warning('Gave up after %d retries for %s', MAX_RETRIES, output_path)
+        return False
+
+
+def azure_throttled(details):
+    """Whether Azure cancellation details say the request was throttled (TooManyRequests / HTTP 429)."""
+    if details is None:
+        return False
+    code = getattr(details, 'error_code', None)
+    if code is not None and str(code).rsplit('.', 1)[-1] == 'TooManyRequests':
+        return True
+    return re.search(r'\b429\b', str(getattr(details, 'error_details', '') or '')) is not None
+
+
+class AzureBackend(TTSBackend):
+    name = 'azure'
+    capabilities = Capabilities(ssml=True, batch_size=1, word_timings=True)
+
+    # speechsdk.SpeechSynthesisOutputFormat member to set on the SpeechConfig (the SDK default is 24 kHz)
+    OUTPUT_FORMAT = 'Riff16Khz16BitMonoPcm'
+
+    def __init__(self, synthesizer):
+        self.synthesizer = synthesizer    # callable returning a speechsdk.SpeechSynthesizer (may differ per thread)
+        self._events = {}                 # result_id -> [[word, offset_ms, duration_ms], ...] while it synthesizes
+        self._events_lock = threading.Lock()
+        self._connected = {}              # id -> synthesizer already subscribed to (kept so ids stay unique)
+
+    def _connect(self, synthesizer):
+        """Subscribe to the word-boundary and bookmark events once per synthesizer; they arrive
+        before the result, tagged with its result_id, so concurrent requests do not mix."""
+        with self._events_lock:
+            if id(synthesizer) in self._connected:
+                return
+            self._connected[id(synthesizer)] = synthesizer
+        synthesizer.synthesis_word_boundary.connect(self._on_word_boundary)
+        synthesizer.bookmark_reached.connect(self._on_bookmark)
+
+    def _on_word_boundary(self, evt):
+        if str(evt.boundary_type).rsplit('.', 1)[-1] != 'Word':
+            return    # punctuation / sentence boundaries
+        duration = evt.duration
+        duration_ms = round(duration.total_seconds() * 1000) if hasattr(duration, 'total_seconds') else int(duration)
+        with self._events_lock:
+            self._events.setdefault(evt.result_id, []).append([evt.text, ticks_to_ms(evt.audio_offset), duration_ms])
+
+    def _on_bookmark(self, evt):
+        with self._events_lock:
+            self._events.setdefault(evt.result_id, []).append([f'#{evt.text}', ticks_to_ms(evt.audio_offset), 0])
+
+    def synthesize(self, text, voice, output_path, style='', words=None):
+        import azure.cognitiveservices.speech as speechsdk
+        ssml = to_ssml(voice, text)
+        retries = 0
+        while retries < MAX_RETRIES:
+            try:
+                start = time.perf_counter()
+                synthesizer = self.synthesizer()
+                self._connect(synthesizer)
+                result = synthesizer.speak_ssml_async(ssml).get()
+                with self._events_lock:
+                    events = self._events.pop(result.result_id, [])
+            except Exception as e:
+                METRICS.inc('requests_total', provider='azure', status='error')
+                print(f"Exception during synthesis: {e}")
+            else:
+                if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+                    # outside the try: a local write error must not re-bill the request
+                    METRICS.observe('request_latency_seconds', time.perf_counter() - start, provider='azure')
+                    METRICS.inc('bytes_received_total', len(result.audio_data), provider='azure')
+                    METRICS.inc('requests_total', provider='azure', status='ok')
+                    # rewritten rather than copied so the header is canonical whatever format the synthesizer was built with
+                    write_audio(output_path, wav_to_pcm(result.audio_data, self.capabilities.sample_rate))
+                    if words is not None:
+                        words.extend(events)
+                    return True
+
+                details = getattr(result, 'cancellation_details', None)
+                if azure_throttled(details):
+                    METRICS.inc('requests_total', provider='azure', status='throttled')
+                    CREDENTIALS.throttled('azure')
+                else:
+                    # auth failures, bad SSML, network errors: retried, but not a sign of overload
+                    METRICS.inc('requests_total', provider='azure', status='canceled')
+                print(f"Err: {result.reason}")
+                if hasattr(result, "cancellation_details") and result.cancellation_details:
+                    print("Details:", result.cancellation_details)
+                    if getattr(result.cancellation_details, "error_details", None):
+                        print("Error details:", result.cancellation_details.error_details)
+
+            METRICS.inc('retries_total', provider='azure')
+            wait = backoff(retries)
+            print(f"Retry in {wait:.1f}s...")
+            time.sleep(wait)
+            retries += 1
+
+        METRICS.inc('requests_gave_up_total', provider='azure')
+        logger.warning('Gave up after %d retries for %s', MAX_RETRIES, output_path)
+        return False
+
+
+class ToneBackend(TTSBackend):
+    """Offline, deterministic stand-in: a sine tone per voice whose length follows the text,
+    with SSML <break time=.../> rendered as silence. Needs no keys or network."""
+
+    name = 'tone'
+    capabilities = Capabilities(ssml=True, instructions=True, streaming=True, batch_size=64, word_timings=True)
+
+    SECONDS_PER_CHAR = 0.06
+    AMPLITUDE = 3000
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    def _frequency(self, voice):
+        # 120-400 Hz, fixed per voice so different speakers are distinguishable
+        return 120 + int(hashlib.sha1(str(voice).encode()).hexdigest(), 16) % 281
+
+    def _segments(self, text):
+        """[(is_speech, seconds, words)] from the text, splitting on SSML breaks."""
+        segments = []
+        for i, part in enumerate(re.split(r'<break\s+time=[\'"]([\d.]+)(m?s)[\'"]\s*/>', text)):
+            if i % 3 == 0:
+                words = re.sub(r'<[^>]+>', '', part).strip()
+                if words:
+                    segments.append((True, min(max(len(words) * self.SECONDS_PER_CHAR, 0.3), 10.0), words))
+            elif i % 3 == 1:
+                segments.append((False, float(part), ''))
+            elif part == 'ms':
+                segments[-1] = (False, segments[-1][1] / 1000, '')
+        return segments or [(True, 0.3, '')]
+
+    def word_timings(self, text):
+        """[word, offset_ms, duration_ms] per word, each speech segment shared out by word length."""
+        timings, offset = [], 0.0
+        for is_speech, seconds, words in self._segments(text):
+            if is_speech and words:
+                total = len(words.replace(' ', ''))
+                for word in words.split():
+                    duration = seconds * len(word) / total
+                    timings.append([word, round(offset * 1000), round(duration * 1000)])
+                    offset += duration
+            else:
+                offset += seconds
+        return timings
+
+    def pcm(self, text, voice):
+        freq = self._frequency(voice)
+        samples = array('h')
+        for is_speech, seconds, _ in self._segments(text):
+            n = int(seconds * self.sample_rate)
+            if is_speech:
+                step = 2 * math.pi * freq / self.sample_rate
+                samples.extend(int(self.AMPLITUDE * math.sin(step * i)) for i in range(n))
+            else:
+                samples.extend(array('h', bytes(2 * n)))
+        return samples.tobytes()
+
+    def stream(self, text, voice, style='', chunk_size=32768):
+        """Raw 16-bit PCM chunks."""
+        pcm = self.pcm(text, voice)
+        for i in range(0, len(pcm), chunk_size):
+            yield pcm[i:i + chunk_size]
+
+    def synthesize(self, text, voice, output_path, style='', words=None):
+        start = time.perf_counter()
+        pcm = self.pcm(text, voice)
+        write_audio(output_path, pcm, self.sample_rate)
+        if words is not None:
+            words.extend(self.word_timings(text))
+        METRICS.observe('request_latency_seconds', time.perf_counter() - start, provider='tone')
+        METRICS.inc('bytes_received_total', len(pcm), provider='tone')
+        METRICS.inc('requests_total', provider='tone', status='ok')
+        return True
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+
+from .utils_metrics import METRICS
+
+# list prices in USD per 1k billed characters; override with --price provider=usd_per_1k
+#   azure: neural TTS, $16 / 1M characters
+#   elevenlabs: turbo/flash models on a creator plan, ~1 credit per character
+#   openai: gpt-4o-mini-tts, ~$0.015 per audio minute at ~1k characters per minute
+DEFAULT_PRICES_PER_1K_CHARS = {'azure': 0.016, 'elevenlabs': 0.30, 'openai': 0.015}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def billable_characters(provider, text, style=''):
+    """Characters a request is billed for: the text (SSML content for Azure), plus the instructions for OpenAI."""
+    return len(text) + (len(style) if provider == 'openai' else 0)
+
+
+def cost_usd(provider, characters, prices=None):
+    prices = prices or DEFAULT_PRICES_PER_1K_CHARS
+    return characters / 1000 * prices.get(provider, 0.0)
+
+
+def parse_provider_values(items):
+    """['azure=20000', ...] -> {'azure': 20000.0}"""
+    values = {}
+    for item in items or []:
+        provider, _, value = item.partition('=')
+        values[provider] = float(value)
+    return values
+
+
+class Budget:
+    """Dollar budget for a run plus per-provider characters-per-minute limits.
+
+    acquire() is called before every provider request: it raises BudgetExceeded if the request
+    would overrun max_usd and otherwise waits until the provider's last-minute character count
+    leaves room for it. release() settles the request once it has finished.
+    """
+
+    def __init__(self, max_usd=None, chars_per_min=None, prices=None):
+        self.max_usd = max_usd
+        self.chars_per_min = chars_per_min or {}
+        self.prices = dict(DEFAULT_PRICES_PER_1K_CHARS, **(prices or {}))
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.characters = {}
+        self.exhausted = False
+        self._windows = {}   # provider -> deque of (timestamp, characters) in the last minute
+        self._lock = threading.Lock()
+
+    def cost(self, provider, characters):
+        return cost_usd(provider, characters, self.prices)
+
+    def remaining(self):
+        return None if self.max_usd is None else self.max_usd - self.spent - self.reserved
+
+    def acquire(self, provider, characters):
+        cost = self.cost(provider, characters)
+        with self._lock:
+            if self.max_usd is not None and self.spent + self.reserved + cost > self.max_usd:
+                self.exhausted = True
+                raise BudgetExceeded(f'${self.spent:.2f} of ${self.max_usd:.2f} spent, next {provider} request costs ${cost:.4f}')
+            self.reserved += cost
+        limit = self.chars_per_min.get(provider)
+        if limit:
+            self._wait_for_characters(provider, characters, limit)
+
+    def release(self, provider, characters, success):
+        """Settle a request started with acquire(); only successful requests are billed."""
+        cost = self.cost(provider, characters)
+        with self._lock:
+            self.reserved -= cost
+            if success:
+                self.spent += cost
+                self.characters[provider] = self.characters.get(provider, 0) + characters
+        if success:
+            METRICS.inc('characters_total', characters, provider=provider)
+            METRICS.inc('cost_usd_total', cost, provider=provider)
+
+    def _wait_for_characters(self, provider, characters, limit):
+        while True:
+            with self._lock:
+                window = self._windows.setdefault(provider, deque())
+                now = time.time()
+                while window and now - window[0][0] >= 60:
+                    window.popleft()
+                used = sum(c for _, c in window)
+                if not window or used + characters <= limit:
+                    window.append((now, characters))
+                    return
+                wait = 60 - (now - window[0][0])
+            METRICS.inc('char_limit_sleep_seconds_total', wait, provider=provider)
+            time.sleep(wait)
+
+    def affordable(self, costs):
+        """Number of leading items of costs that fit in the remaining budget."""
+        remaining = self.remaining()
+        if remaining is None:
+            return len(costs)
+        total = 0.0
+        for i, cost in enumerate(costs):
+            total += cost
+            if total > remaining:
+                return i
+        return len(costs)
+
+    def summary(self):
+        chars = ', '.join(f'{k}: {v}' for k, v in sorted(self.characters.items())) or 'none'
+        limit = f' of ${self.max_usd:.2f}' if self.max_usd is not None else ''
+        return f'[BUDGET] spent ${self.spent:.2f}{limit}, characters: {chars}'
@@ -0,0 +1,125 @@
+import threading
+import time
+
+from .utils_metrics import METRICS
+
+# AIMD (additive increase, multiplicative decrease) window per provider, as in TCP congestion control:
+# below the slow-start threshold every success adds one slot (the window doubles per round trip),
+# above it every success adds 1/window (one slot per round trip). A throttle (HTTP 429, Azure
+# cancellation), a request that gives up, or a latency spike multiplies the window by DECREASE_FACTOR,
+# at most once per round trip so a burst of throttles from one window counts once.
+DEFAULT_MAX_WINDOW = 16
+MIN_WINDOW = 1.0
+DECREASE_FACTOR = 0.5
+LATENCY_SPIKE = 2.0         # seconds per character this many times the baseline is congestion
+LATENCY_ALPHA = 0.05        # EWMA weight of a new sample in the baseline (it keeps adapting, slowly)
+LATENCY_WARMUP = 10         # successes before latency spikes count
+MIN_CHARACTERS = 20         # latency is normalized per character, short requests as if this long
+
+
+class ProviderWindow:
+    """One provider's window, in-flight count and latency baseline; guarded by the controller's condition."""
+
+    def __init__(self, max_window):
+        self.window = MIN_WINDOW
+        self.max_window = max_window
+        self.threshold = float(max_window)   # slow start until the first decrease
+        self.in_flight = 0
+        self.baseline = None                 # EWMA of seconds per character
+        self.round_trip = 0.0                # EWMA of request latency: the decrease cooldown
+        self.samples = 0
+        self.last_decrease = 0.0
+
+
+class ConcurrencyController:
+    """Caps in-flight requests per provider to an AIMD window driven by throttles and latency.
+
+    acquire() blocks until the provider has a free slot and returns the request's start time;
+    release() settles it with its outcome. A provider here is any name: utils_credentials keeps one
+    window per API key. Backends report throttles from inside their retry loops
+    with throttled(), so the window shrinks while a request is still backing off.
+    The window and in-flight count of every provider are exported as gauges.
+    """
+
+    def __init__(self, max_window=DEFAULT_MAX_WINDOW):
+        self.max_window = max_window
+        self._providers = {}
+        self._cond = threading.Condition()
+
+    def configure(self, max_window):
+        with self._cond:
+            self.max_window = max_window
+            for state in self._providers.values():
+                state.max_window = max_window
+                state.window = min(state.window, max_window)
+                state.threshold = min(state.threshold, max_window)
+            self._cond.notify_all()
+
+    def _state(self, provider):
+        if provider not in self._providers:
+            self._providers[provider] = ProviderWindow(self.max_window)
+        return self._providers[provider]
+
+    def _export(self, provider, state):
+        METRICS.set('concurrency_window', round(state.window, 2), provider=provider)
+        METRICS.set('requests_in_flight', state.in_flight, provider=provider)
+
+    def window(self, provider):
+        with self._cond:
+            return self._state(provider).window
+
+    def acquire(self, provider):
+        return self.acquire_any([provider])[1]
+
+    def acquire_any(self, providers):
+        """acquire() on whichever of providers (e.g. the API keys of one provider) has the most free
+        slots, the first of them on a tie; returns (provider, start time)."""
+        with self._cond:
+            while True:
+                provider, state = max(((p, self._state(p)) for p in providers), key=lambda ps: int(ps[1].window) - ps[1].in_flight)
+                if state.in_flight < int(state.window):
+                    break
+                self._cond.wait()
+            state.in_flight += 1
+            self._export(provider, state)
+        return provider, time.perf_counter()
+
+    def release(self, provider, start, characters, success):
+        latency = time.perf_counter() - start
+        with self._cond:
+            state = self._state(provider)
+            state.in_flight -= 1
+            if not success:
+                self._decrease(provider, state, 'failure')
+            elif start < state.last_decrease:
+                pass    # overlapped a decrease: its latency includes backoff, and it must not grow the window back
+            else:
+                per_char = latency / max(characters, MIN_CHARACTERS)
+                spike = state.samples >= LATENCY_WARMUP and per_char > LATENCY_SPIKE * state.baseline
+                state.baseline = per_char if state.baseline is None else state.baseline + LATENCY_ALPHA * (per_char - state.baseline)
+                state.round_trip = latency if not state.samples else state.round_trip + LATENCY_ALPHA * (latency - state.round_trip)
+                state.samples += 1
+                if spike:
+                    self._decrease(provider, state, 'latency')
+                else:
+                    step = 1.0 if state.window < state.threshold else 1.0 / state.window
+                    state.window = min(state.window + step, state.max_window)
+            self._export(provider, state)
+            self._cond.notify_all()
+
+    def throttled(self, provider):
+        with self._cond:
+            self._decrease(provider, self._state(provider), 'throttle')
+
+    def _decrease(self, provider, state, reason):
+        now = time.perf_counter()
+        if now - state.last_decrease < state.round_trip:
+            return
+        state.last_decrease = now
+        state.window = max(state.window * DECREASE_FACTOR, MIN_WINDOW)
+        state.threshold = state.window
+        METRICS.inc('concurrency_decreases_total', provider=provider, reason=reason)
+        self._export(provider, state)
+
+
+CONCURRENCY = ConcurrencyController()
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+from .utils_concurrency import CONCURRENCY, MIN_WINDOW
+from .utils_metrics import METRICS
+
+# environment variables holding each provider's API keys (and Azure's regions), comma-separated:
+#   AZURE_API_KEY=key1,key2  AZURE_API_REGION=eastus,westeurope   (one region for all keys also works)
+ENV_KEYS = {
+    'openai': ('OPENAI_API_KEY', None),
+    'elevenlabs': ('ELEVENLABS_API_KEY', None),
+    'azure': ('AZURE_API_KEY', 'AZURE_API_REGION'),
+}
+
+# a key that throttles or fails this many requests in a row while its window is already down to
+# MIN_WINDOW is drained: no new requests go to it while another key is healthy. Throttles above the
+# minimum are AIMD finding the key's limit, not a sick key. The drain lasts DRAIN_SECONDS, doubling
+# for every drain without a success in between (up to MAX_DRAIN_SECONDS); afterwards the key is
+# tried again with the window it had.
+DRAIN_AFTER = 3
+DRAIN_SECONDS = 30.0
+MAX_DRAIN_SECONDS = 600.0
+
+
+def split_values(value):
+    """'a, b,,c' -> ['a', 'b', 'c']; None -> []."""
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+
+class Credential:
+    """One API key (and Azure region) of a provider and its health. Its rate limiter is the AIMD
+    window CONCURRENCY keeps under its name: the provider's name if it is the only key, else
+    'azure/westeurope' (the region) or 'openai/1' (the position in the list)."""
+
+    def __init__(self, provider, key, region=None, name=None):
+        self.provider = provider
+        self.key = key
+        self.region = region
+        self.name = name or provider
+        self.failures = 0            # throttles / failed requests at the minimum window since the last success
+        self.drains = 0              # drains since the last success
+        self.drained_until = 0.0     # time.monotonic() before which no new request is routed here
+        self.client = None           # provider client built for this key on first use (see tts_engine.get_*)
+        self.rate = None             # the key's requests/minute counter (tts_engine.request_rate)
+
+    def __repr__(self):
+        return f'Credential({self.name})'    # never the key
+
+
+class CredentialPool:
+    """Every provider's keys, read from ENV_KEYS on first use (load() re-reads them, e.g. after --env-file).
+
+    acquire() routes a request to the healthy key with the most free slots in its window, blocking
+    until one has a slot, and makes it the calling thread's key: the engine's get_* client functions
+    build their client from current(). Backends report throttles with throttled(), which shrinks
+    that key's window and counts toward draining it; release() settles the request.
+    """
+
+    def __init__(self):
+        self._pools = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def load(self, environ=None):
+        environ = os.environ if environ is None else environ
+        pools = {}
+        for provider, (key_var, region_var) in ENV_KEYS.items():
+            keys = split_values(environ.get(key_var))
+            regions = split_values(environ.get(region_var)) if region_var else []
+            if len(regions) == 1:
+                regions = regions * len(keys)
+            if regions and len(regions) != len(keys):
+                raise ValueError(f'{region_var} lists {len(regions)} regions for {len(keys)} keys in {key_var}')
+            if len(keys) <= 1:
+                pools[provider] = [Credential(provider, keys[0] if keys else None, regions[0] if regions else None)]
+                continue
+            labels = regions if len(set(regions)) == len(keys) else [str(i) for i in range(len(keys))]
+            pools[provider] = [Credential(provider, key, regions[i] if regions else None, f'{provider}/{labels[i]}') for i, key in enumerate(keys)]
+        with self._lock:
+            self._pools = pools
+        return self
+
+    def credentials(self, provider):
+        if self._pools is None:
+            self.load()
+        with self._lock:
+            if provider not in self._pools:
+                self._pools[provider] = [Credential(provider, None)]    # e.g. the offline tone backend
+            return list(self._pools[provider])
+
+    def size(self, provider):
+        return len(self.credentials(provider))
+
+    def current(self, provider):
+        """The key the calling thread's request holds; the provider's first key outside a request (e.g. listing voices)."""
+        credential = getattr(self._local, 'credential', None)
+        if credential is not None and credential.provider == provider:
+            return credential
+        return self.credentials(provider)[0]
+
+    def acquire(self, provider):
+        """Take a slot on the healthy key with the most free slots; returns (credential, start time).
+        If every key is drained, the one whose drain ends first is used. Keys that have used up this
+        minute's requests are passed over while another key has some left."""
+        pool = self.credentials(provider)
+        now = time.monotonic()
+        healthy = [c for c in pool if c.drained_until <= now] or [min(pool, key=lambda c: c.drained_until)]
+        healthy = [c for c in healthy if c.rate is None or not c.rate.full()] or healthy
+        name, start = CONCURRENCY.acquire_any([c.name for c in healthy])
+        credential = next(c for c in healthy if c.name == name)
+        self._local.credential = credential
+        return credential, start
+
+    def release(self, credential, start, characters, success):
+        self._local.credential = None
+        CONCURRENCY.release(credential.name, start, characters, success)
+        if success:
+            with self._lock:
+                credential.failures = credential.drains = 0
+        else:
+            self._fail(credential, 'failure')
+
+    def throttled(self, provider):
+        credential = self.current(provider)
+        CONCURRENCY.throttled(credential.name)
+        self._fail(credential, 'throttle')
+
+    def _fail(self, credential, reason):
+        if self.size(credential.provider) < 2 or CONCURRENCY.window(credential.name) > MIN_WINDOW:
+            return    # a single key is used whatever its health; above the minimum window AIMD handles it
+        with self._lock:
+            credential.failures += 1
+            if credential.failures < DRAIN_AFTER:
+                return
+            seconds = min(DRAIN_SECONDS * 2 ** credential.drains, MAX_DRAIN_SECONDS)
+            credential.drained_until = time.monotonic() + seconds
+            credential.drains += 1
+            credential.failures = 0
+        METRICS.inc('credential_drains_total', provider=credential.name, reason=reason)
+        print(f'Draining {credential.name} for {seconds:.0f}s after {DRAIN_AFTER} {reason}s in a row at a window of {MIN_WINDOW:g}')
+
+
+CREDENTIALS = CredentialPool()
@@ -0,0 +1,110 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+_listener = None
+
+def setup_logger(script_name: str, log_dir: str = 'logs', level: str = None) -> str:
+    """Route logging and print() through a queue drained by a background writer thread.
+
+    Callers only pay for a queue put; formatting and file/console I/O happen on the
+    listener thread, so many generation threads can log without contending on a lock.
+    The level defaults to $LOG_LEVEL (INFO); per-sample messages are logged at DEBUG.
+    """
+    global _listener
+
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_path = os.path.join(log_dir, f"{script_name}_{timestamp}.log")
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+
+    logger = logging.getLogger()
+    logger.setLevel(level)
+
+    formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(threadName)s | %(message)s')
+
+    file_handler = logging.FileHandler(log_path)
+    file_handler.setFormatter(formatter)
+
+    # always the real stdout, sys.stdout is redirected below
+    console_handler = logging.StreamHandler(sys.__stdout__)
+    console_handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    class PrintRedirect:
+        # print() issues several write() calls per line; buffer them per thread so
+        # concurrent prints are logged as whole, non-interleaved records
+        def __init__(self, level):
+            self.level = level
+            self._local = threading.local()
+        def write(self, message):
+            buffer = getattr(self._local, 'buffer', '') + message
+            if buffer.endswith('\n'):
+                if buffer.strip():
+                    logger.log(self.level, '%s', buffer.strip())
+                buffer = ''
+            self._local.buffer = buffer
+        def flush(self): pass
+
+    # stderr (tracebacks, warnings) is logged at ERROR so LOG_LEVEL=WARNING still shows it
+    sys.stdout = PrintRedirect(logging.INFO)
+    sys.stderr = PrintRedirect(logging.ERROR)
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+    print(f"[LOGGING] Output is being saved to: {log_path}")
+    return log_path
+
+
+class ProgressReporter:
+    """Thread-safe counters with an INFO summary at most once every `interval` seconds."""
+
+    def __init__(self, name, total=None, interval=10.0, logger=None):
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.logger = logger or logging.getLogger('progress')
+        self.counts = {}
+        self.start = time.time()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def update(self, key, n=1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+            now = time.time()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            message = self._format(now)
+        self.logger.info(message)
+
+    def done(self):
+        with self._lock:
+            message = self._format(time.time())
+        self.logger.info(message)
+
+    def _format(self, now):
+        processed = sum(self.counts.values())
+        elapsed = max(now - self.start, 1e-9)
+        counts = ', '.join(f'{k}: {v}' for k, v in sorted(self.counts.items()))
+        total = f'/{self.total}' if self.total is not None else ''
+        return f'[progress] {self.name}: {processed}{total} processed ({counts}) in {elapsed:.0f}s, {processed / elapsed:.1f}/s'
@@ -0,0 +1,82 @@
+"""
+Prompt layout and audio durations shared by the Flamingo manifest (create_manifest.py) and the
+inference inputs (model_eval_results/build_inference_inputs.py): the model must see the same
+prompt text in both, and both read .wav and .flac durations from the header without decoding.
+"""
+
+import os
+import wave
+from typing import Any, Dict, Optional
+
+
+def build_prompt_with_choices(item: Dict[str, Any]) -> str:
+    """If override provided, use it; else build: 'question (A): choice_a. (B): choice_b. ...'"""
+    q = (item.get("question") or "").strip()
+    pieces = []
+
+    # Include choices in A..Z order if present: choice_a, choice_b, ...
+    letters = "abcd"
+    for i, letter in enumerate(letters):
+        key = f"choice_{letter}"
+        if key in item:
+            label = chr(ord('A') + i)  # A, B, C, ...
+            val = str(item[key]).strip()
+            # Ensure a trailing period for each choice piece
+            if val and val[-1] not in ".!?":
+                val = val + "."
+            pieces.append(f"({label}): {val}")
+
+    # Build final prompt
+    if pieces:
+        # Ensure the question ends with punctuation
+        if q and q[-1] not in "?!:.":
+            q = q + "?"
+        return (q + " " + " ".join(pieces)).strip()
+    else:
+        return q  # fallback to just the question
+
+def get_wav_duration_seconds(path: str) -> Optional[float]:
+    """Get duration for a WAV file using the stdlib wave module."""
+    try:
+        with wave.open(path, "rb") as wf:
+            frames = wf.getnframes()
+            rate = wf.getframerate()
+            if rate and frames:
+                return round(frames / float(rate), 6)
+    except Exception:
+        return None
+    return None
+
+def get_flac_duration_seconds(path: str) -> Optional[float]:
+    """Get duration for a FLAC file from its STREAMINFO block (total samples / sample rate)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(10)
+            if head[:3] == b"ID3":
+                # skip an ID3v2 tag; its size is four 7-bit bytes
+                size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+                f.seek(10 + size)
+            else:
+                f.seek(0)
+            # "fLaC", then the mandatory STREAMINFO block: 4-byte block header + 34 bytes
+            data = f.read(42)
+        if data[:4] != b"fLaC" or data[4] & 0x7F != 0:
+            return None
+        # bytes 10-17 of STREAMINFO: sample rate (20 bits), channels-1 (3), bits-1 (5), total samples (36)
+        packed = int.from_bytes(data[18:26], "big")
+        rate = packed >> 44
+        frames = packed & ((1 << 36) - 1)
+        if rate and frames:
+            return round(frames / float(rate), 6)
+    except Exception:
+        return None
+    return None
+
+def get_audio_duration_seconds(path: str) -> Optional[float]:
+    """Duration of a .wav or .flac file; None for other formats."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        return get_wav_duration_seconds(path)
+    if ext == ".flac":
+        return get_flac_duration_seconds(path)
+    return None
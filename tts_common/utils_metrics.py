@@ -0,0 +1,193 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    inner = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f'{name}{{{inner}}}'
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated inside the bucket."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by name and labels."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'ts': time.time(),
+                'elapsed': round(time.time() - self.start, 3),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {k: h.summary() for k, h in self.histograms.items()},
+            }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for key, value in sorted(self.counters.items()):
+                lines.append(f'{key} {value}')
+            for key, value in sorted(self.gauges.items()):
+                lines.append(f'{key} {value}')
+            for key, h in sorted(self.histograms.items()):
+                name, _, labels = key.partition('{')
+                labels = labels.rstrip('}')
+                sep = ',' if labels else ''
+                cumulative = 0
+                for bound, c in zip(list(h.buckets) + ['+Inf'], h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{suffix} {h.sum}')
+                lines.append(f'{name}_count{suffix} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+
+class MetricsExporter:
+    """Appends a registry snapshot to a JSONL file every `interval` seconds and,
+    optionally, serves the Prometheus text format on localhost:<prometheus_port>/metrics."""
+
+    def __init__(self, registry, path, interval=10.0, prometheus_port=None, rate_counter='samples_generated_total'):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.rate_counter = rate_counter
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+        self._last = (time.time(), 0)
+        self._server = None
+        if prometheus_port:
+            self._server = self._start_http(prometheus_port)
+
+    def _start_http(self, port):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f'[METRICS] Prometheus endpoint at http://127.0.0.1:{port}/metrics')
+        return server
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        print(f'[METRICS] Writing metrics every {self.interval:.0f}s to: {self.path}')
+        return self
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.export()
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self):
+        snap = self.registry.snapshot()
+        done = sum(v for k, v in snap['counters'].items() if k.split('{')[0] == self.rate_counter)
+        last_ts, last_done = self._last
+        snap['samples_per_sec'] = round((done - last_done) / max(snap['ts'] - last_ts, 1e-9), 3)
+        self._last = (snap['ts'], done)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(snap) + '\n')
+
+
+def start_metrics(path, interval=10.0, prometheus_port=None):
+    return MetricsExporter(METRICS, path, interval, prometheus_port).start()
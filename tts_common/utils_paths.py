@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+# hex characters of the name's SHA-1 per fan-out level: 256 subdirectories per level
+FANOUT_WIDTH = 2
+MAX_FANOUT = 4
+
+
+def fanout_dirs(filename, levels):
+    """['3f', 'a0', ...]: the levels subdirectories a file lives under. The hash is of the name
+    without its extension, so a .wav and a .flac of the same sample land in the same place."""
+    if not levels:
+        return []
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    digest = hashlib.sha1(stem.encode('utf-8')).hexdigest()
+    return [digest[i * FANOUT_WIDTH:(i + 1) * FANOUT_WIDTH] for i in range(levels)]
+
+
+def fanout_path(directory, filename, levels=0):
+    """directory/filename with levels hash-prefix directories in between (levels=0: flat)."""
+    return os.path.join(directory, *fanout_dirs(filename, levels), filename)
+
+
+def locate(path, max_levels=MAX_FANOUT):
+    """path if it exists, else the same file flat or at another fan-out depth under the same
+    directory; path itself if none exists. Lets a ledger or MCQ file written with one layout find
+    audio stored with another."""
+    if os.path.exists(path):
+        return path
+    directory, filename = os.path.split(path)
+    root, parts = directory, os.path.normpath(directory).split(os.sep)
+    for levels in range(max_levels, 0, -1):
+        if len(parts) > levels and parts[-levels:] == fanout_dirs(filename, levels):
+            root = os.sep.join(parts[:-levels])    # path is already fanned out: strip its hash directories
+            break
+    for levels in range(max_levels + 1):
+        candidate = fanout_path(root, filename, levels)
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+def rebase(path, old_root, new_root):
+    """path with its old_root prefix replaced by new_root, compared by normalized components
+    (so './tts_outputs/x' and 'tts_outputs/x' both match); path unchanged if it is not under old_root."""
+    rel = os.path.relpath(os.path.normpath(path), os.path.normpath(old_root))
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep) or os.path.isabs(rel):
+        return path
+    return os.path.join(new_root, rel)
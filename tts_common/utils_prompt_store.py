@@ -0,0 +1,230 @@
+import json
+import mmap
+import os
+
+INDEX_VERSION = 1
+# with the JSON file moved aside the store loads without a conflict and export() writes it back
+RESOLVE_CONFLICT = ('keep the JSON file by deleting the store files, or keep the store by moving the JSON file aside '
+                    'and calling PromptStore(json_path).export()')
+
+
+class PromptStoreConflict(Exception):
+    pass
+
+
+class PromptStore:
+    """Append-only, indexed store behind a prompt JSON file ({task: {'prompt': ..., subtask: value}}).
+
+    Every write is one JSON line in <name>.store.jsonl: {"t": task, "s": subtask, "op": "set" | "extend", "v": value};
+    an import from the JSON file ends with {"op": "sync", "v": its [mtime_ns, size]}.
+    <name>.store.idx maps task -> subtask -> [[offset, length], ...] of its lines, so task(), subtask()
+    and tasks() read (through an mmap) only the lines they need, and extend() / set() append one line
+    instead of rewriting the JSON. export() writes the JSON layout back and compacts the store.
+
+    The JSON file stays the interchange format: the store is built from it on first use and rebuilt
+    if it is edited by hand (e.g. filter_scripts.py), unless the store holds entries that were never
+    exported, in which case PromptStoreConflict is raised instead of dropping them.
+    """
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+        base = os.path.splitext(json_path)[0]
+        self.store_path = f'{base}.store.jsonl'
+        self.index_path = f'{base}.store.idx'
+        self._mmap = None
+        self._mmap_size = 0
+        self._load()
+
+    # index
+
+    def _json_signature(self):
+        st = os.stat(self.json_path)
+        return [st.st_mtime_ns, st.st_size]
+
+    def _load(self):
+        meta = None
+        if os.path.exists(self.index_path) and os.path.exists(self.store_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                meta = None
+        if meta is None or meta.get('version') != INDEX_VERSION:
+            if not (os.path.exists(self.store_path) and os.path.getsize(self.store_path)):
+                self._import_json()
+                return
+            self._rebuild_index()
+        else:
+            self.index = meta['index']
+            self.store_size = meta['store_size']
+            self.synced_size = meta['synced_size']
+            self.json_signature = meta['json']
+            if os.path.getsize(self.store_path) > self.store_size:
+                self._scan(self.store_size)    # lines appended after the index was last written
+                self._write_index()
+        if os.path.exists(self.json_path) and self._json_signature() != self.json_signature:
+            if self.synced_size is None:
+                raise PromptStoreConflict(
+                    f'{self.store_path} has no sync point and differs from {self.json_path}, so it is unknown which '
+                    f'side holds the newer entries; {RESOLVE_CONFLICT}')
+            if self.store_size != self.synced_size:
+                raise PromptStoreConflict(
+                    f'{self.json_path} changed on disk but {self.store_path} has entries that were never exported; '
+                    f'{RESOLVE_CONFLICT}')
+            self._import_json()
+
+    def _rebuild_index(self):
+        """Lost or outdated index: re-index the store. Its last sync line restores the point it was in
+        sync with the JSON file, so edits to the JSON since then are still imported (or conflict with
+        entries appended after it); a store without one is in sync only if it holds the JSON's prompts."""
+        self.index = {}
+        self.store_size = 0
+        self.synced_size = None
+        self.json_signature = None
+        self._scan(0)
+        if self.synced_size is None and os.path.exists(self.json_path):
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                prompts = json.load(f)
+            if prompts == {task: self.task(task) for task in self.tasks()}:
+                self.synced_size = self.store_size
+                self.json_signature = self._json_signature()
+        self._write_index()
+
+    def _scan(self, start):
+        """Index the store's lines from byte offset start."""
+        with open(self.store_path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break    # torn last write
+                entry = json.loads(line)
+                if entry['op'] == 'sync':
+                    self.synced_size = offset + len(line)
+                    self.json_signature = entry['v']
+                else:
+                    spans = self.index.setdefault(entry['t'], {}).setdefault(entry['s'], [])
+                    if entry['op'] == 'set':
+                        spans.clear()
+                    spans.append([offset, len(line)])
+                offset += len(line)
+        self.store_size = offset
+
+    def _write_index(self):
+        tmp = f'{self.index_path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'json': self.json_signature,
+                'store_size': self.store_size,
+                'synced_size': self.synced_size,
+                'index': self.index,
+            }, f)
+        os.replace(tmp, self.index_path)
+
+    def _import_json(self):
+        """(Re)build the store from the JSON file: one set line per (task, subtask)."""
+        self._close_mmap()
+        self.index = {}
+        self.store_size = 0
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            prompts = json.load(f)
+        with open(self.store_path, 'wb') as f:
+            for task, task_data in prompts.items():
+                for subtask, value in task_data.items():
+                    self.store_size += self._write_line(f, task, subtask, 'set', value)
+            self.json_signature = self._json_signature()
+            line = (json.dumps({'op': 'sync', 'v': self.json_signature}) + '\n').encode('utf-8')
+            f.write(line)
+            self.store_size += len(line)
+        self.synced_size = self.store_size
+        self._write_index()
+
+    def _write_line(self, f, task, subtask, op, value):
+        line = (json.dumps({'t': task, 's': subtask, 'op': op, 'v': value}) + '\n').encode('utf-8')
+        spans = self.index.setdefault(task, {}).setdefault(subtask, [])
+        if op == 'set':
+            spans.clear()
+        spans.append([self.store_size, len(line)])
+        f.write(line)
+        return len(line)
+
+    # reads
+
+    def _close_mmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._mmap_size = 0
+
+    def _read(self, offset, length):
+        if offset + length > self._mmap_size:
+            self._close_mmap()
+            with open(self.store_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmap_size = len(self._mmap)
+        return json.loads(self._mmap[offset:offset + length])
+
+    def tasks(self):
+        return list(self.index)
+
+    def subtasks(self, task):
+        return list(self.index.get(task, {}))
+
+    def subtask(self, task, subtask):
+        """The current value: the last set, followed by any extends."""
+        value = None
+        for offset, length in self.index[task][subtask]:
+            entry = self._read(offset, length)
+            if entry['op'] == 'set':
+                value = entry['v']
+            else:
+                value = (value or []) + entry['v']
+        return value
+
+    def task(self, task):
+        """{'prompt': ..., subtask: value, ...} in the JSON layout; an unknown task is {}."""
+        return {subtask: self.subtask(task, subtask) for subtask in self.index.get(task, {})}
+
+    # writes
+
+    def _append(self, entries):
+        with open(self.store_path, 'ab') as f:
+            for task, subtask, op, value in entries:
+                self.store_size += self._write_line(f, task, subtask, op, value)
+        self._write_index()
+
+    def set(self, task, subtask, value):
+        self._append([(task, subtask, 'set', value)])
+
+    def extend(self, task, subtask, examples):
+        """Append examples to a list-valued subtask."""
+        self._append([(task, subtask, 'extend', list(examples))])
+
+    def sync(self, task, before, after):
+        """Append what changed from before to after (two versions of task's data): list subtasks
+        that only grew get an extend with the new examples, anything else new or different a set."""
+        entries = []
+        for subtask, value in after.items():
+            old = before.get(subtask)
+            if value == old:
+                continue
+            if isinstance(value, list) and isinstance(old, list) and value[:len(old)] == old:
+                entries.append((task, subtask, 'extend', value[len(old):]))
+            else:
+                entries.append((task, subtask, 'set', value))
+        if entries:
+            self._append(entries)
+        return len(entries)
+
+    def export(self, path=None):
+        """Write every task back in the JSON layout (indent=4) and compact the store to match it."""
+        path = path or self.json_path
+        prompts = {task: self.task(task) for task in self.tasks()}
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(prompts, f, indent=4)
+        os.replace(tmp, path)
+        if path == self.json_path:
+            self._import_json()
+        return path
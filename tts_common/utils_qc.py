@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .utils_backends import SAMPLE_RATE, read_pcm
+from .utils_paths import locate
+
+HOP_S = 0.010               # analysis hop: 10 ms
+ENERGY_FRAME_S = 0.025      # 25 ms RMS frames
+PITCH_FRAME_S = 0.040       # 40 ms autocorrelation frames: over two periods at the 70 Hz floor
+PITCH_RANGE_HZ = (70, 400)
+VOICING_THRESHOLD = 0.5     # normalized autocorrelation peak a voiced frame needs
+SILENCE_DB = 35             # frames this far below the loudest frame count as silence
+
+# label checks
+PAUSE_MIN_FRACTION = 0.6    # a <break time='1s'/> must leave at least 0.6 s of silence inside the utterance
+PROLONG_MIN_S = 0.35        # the prolonged (label) word lasts at least this long
+PROLONG_MIN_RATIO = 1.5     # ... and takes this many times longer per letter than the other words
+CONTOUR_MIN_ST = 1.0        # rising/falling: end-minus-start pitch of at least one semitone the right way
+
+# one column per feature; the cache keeps these plus path / mtime / size
+FEATURES = ['duration', 'speech_duration', 'voiced_ratio', 'longest_pause', 'pause_count', 'longest_voiced', 'pitch_start', 'pitch_end', 'contour_st']
+QC_TASKS = ['pause', 'prolong', 'intonation']
+
+
+def frames(x, frame, hop):
+    """(n_frames, frame) strided view of x, zero-padded so the last samples get a frame too."""
+    if len(x) < frame:
+        x = np.pad(x, (0, frame - len(x)))
+    n = 1 + (len(x) - frame) // hop
+    return np.lib.stride_tricks.as_strided(x, shape=(n, frame), strides=(x.strides[0] * hop, x.strides[0]))
+
+
+def runs(mask):
+    """[(start, length)] of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return list(zip(starts, ends - starts))
+
+
+def frame_energy_db(x, sr=SAMPLE_RATE):
+    f = frames(x, int(ENERGY_FRAME_S * sr), int(HOP_S * sr))
+    return 10 * np.log10(np.mean(f ** 2, axis=1) + 1e-10)
+
+
+def pitch_track(x, sr=SAMPLE_RATE):
+    """f0 in Hz per 10 ms frame (0 where unvoiced) from the FFT autocorrelation of every frame at once."""
+    frame = int(PITCH_FRAME_S * sr)
+    f = frames(x, frame, int(HOP_S * sr))
+    f = f - f.mean(axis=1, keepdims=True)
+    spectrum = np.fft.rfft(f, n=2 * frame, axis=1)
+    ac = np.fft.irfft(np.abs(spectrum) ** 2, axis=1)[:, :frame]
+    lo, hi = int(sr / PITCH_RANGE_HZ[1]), int(sr / PITCH_RANGE_HZ[0])
+    lags = lo + np.argmax(ac[:, lo:hi], axis=1)
+    peak = ac[np.arange(len(ac)), lags] / (ac[:, 0] + 1e-10)
+    return np.where(peak >= VOICING_THRESHOLD, sr / lags, 0.0)
+
+
+def extract_features(path):
+    """{feature: float} for one audio file (all NaN if it cannot be read)."""
+    try:
+        x = np.frombuffer(read_pcm(path), dtype=np.int16).astype(np.float32) / 32768
+    except Exception:
+        return {name: float('nan') for name in FEATURES}
+    duration = len(x) / SAMPLE_RATE
+    energy = frame_energy_db(x)
+    speech = energy > energy.max() - SILENCE_DB
+    f0 = pitch_track(x)
+    n = min(len(speech), len(f0))
+    speech, f0 = speech[:n], f0[:n]
+    voiced = (f0 > 0) & speech
+
+    # silence runs strictly inside the utterance (leading/trailing silence is not a pause)
+    pauses, speech_duration = [], 0.0
+    if speech.any():
+        first, last = np.flatnonzero(speech)[[0, -1]]
+        pauses = [length * HOP_S for _, length in runs(~speech[first:last + 1])]
+        speech_duration = (last + 1 - first) * HOP_S
+    voiced_runs = [length * HOP_S for _, length in runs(voiced)]
+
+    # contour: median pitch over the last vs the first 30% of voiced frames, in semitones
+    pitch_start = pitch_end = contour = float('nan')
+    semitones = 12 * np.log2(f0[voiced] / 100.0)
+    if len(semitones) >= 10:
+        k = max(len(semitones) * 3 // 10, 1)
+        pitch_start, pitch_end = float(np.median(f0[voiced][:k])), float(np.median(f0[voiced][-k:]))
+        contour = float(np.median(semitones[-k:]) - np.median(semitones[:k]))
+
+    return {
+        'duration': duration,
+        'speech_duration': float(speech_duration),
+        'voiced_ratio': float(voiced.mean()) if n else 0.0,
+        'longest_pause': float(max(pauses, default=0.0)),
+        'pause_count': float(sum(p >= 0.2 for p in pauses)),
+        'longest_voiced': float(max(voiced_runs, default=0.0)),
+        'pitch_start': pitch_start,
+        'pitch_end': pitch_end,
+        'contour_st': contour,
+    }
+
+
+def break_seconds(style):
+    """Longest <break time='...'/> in an SSML style string, in seconds (0 if none)."""
+    times = [float(v) / (1000 if unit == 'ms' else 1) for v, unit in re.findall(r'<break\s+time=[\'"]([\d.]+)(m?s)[\'"]', style or '')]
+    return max(times, default=0.0)
+
+
+def word_tokens(text):
+    """Lower-cased words of a text without punctuation: "Well, I'm" -> ['well', "i'm"]."""
+    return re.findall(r"[\w']+", (text or '').lower())
+
+
+def label_word_seconds(record):
+    """(seconds, per-letter ratio to the other words) of the record's label word from its word
+    timings, or None if the record has no timings or the label is not among them. A multi-word
+    label spans from its first word's start to its last word's end; the ratio is None if there are
+    no other words."""
+    timings = [(w[0], w[1], w[2]) for w in record.get('words') or [] if not str(w[0]).startswith('#') and word_tokens(w[0])]
+    tokens = [''.join(word_tokens(word)) for word, _, _ in timings]
+    label = [''.join(word_tokens(w)) for w in word_tokens(record.get('label'))]
+    n = len(label)
+    start = next((i for i in range(len(tokens) - n + 1) if n and tokens[i:i + n] == label), None)
+    if start is None:
+        return None
+    first, last = timings[start], timings[start + n - 1]
+    seconds = (last[1] + last[2] - first[1]) / 1000
+    rates = [duration / len(token) for token, (_, _, duration) in zip(tokens, timings) if token]
+    others = rates[:start] + rates[start + n:]
+    if not others or not np.median(others):
+        return seconds, None
+    return seconds, seconds * 1000 / len(''.join(label)) / float(np.median(others))
+
+
+def check_prolong(record, features):
+    """(measured, expected) if the label word is not prolonged, else None.
+
+    With word timings (Azure word boundaries) the label word itself must last PROLONG_MIN_S and
+    take PROLONG_MIN_RATIO times longer per letter than the other words. Without them the script
+    gives the label's share of the letters: one voiced run must last as long as that share of the
+    speech, i.e. the whole word at an even pace (a normal word's voiced runs are single syllables).
+    """
+    expected = f'>= {PROLONG_MIN_S}s and {PROLONG_MIN_RATIO}x the other words per letter'
+    measured = label_word_seconds(record)
+    if measured is not None:
+        seconds, ratio = measured
+        if seconds < PROLONG_MIN_S or (ratio is not None and ratio < PROLONG_MIN_RATIO):
+            return round(seconds, 3), expected
+        return None
+    label, script = ''.join(word_tokens(record.get('label'))), ''.join(word_tokens(record.get('script')))
+    share = len(label) / len(script) if label and script else 0.0
+    needed = max(PROLONG_MIN_S, share * features['speech_duration'])
+    if features['longest_voiced'] < needed:
+        return round(features['longest_voiced'], 3), f'>= {needed:.2f}s voiced run (no word timings)'
+    return None
+
+
+def check(record, features):
+    """(check, measured, expected) if the audio does not match the record's label, else None."""
+    task = record.get('task')
+    if np.isnan(features['duration']):
+        return 'unreadable', None, None
+    if task == 'pause':
+        expected = break_seconds(record.get('style'))
+        if expected and features['longest_pause'] < PAUSE_MIN_FRACTION * expected:
+            return 'pause', round(features['longest_pause'], 3), f'>= {PAUSE_MIN_FRACTION * expected:.2f}s silence'
+    elif task == 'prolong':
+        result = check_prolong(record, features)
+        if result is not None:
+            return ('prolong',) + result
+    elif task == 'intonation' and record.get('label') in ('rising', 'falling'):
+        contour = features['contour_st']
+        sign = 1 if record['label'] == 'rising' else -1
+        if np.isnan(contour) or sign * contour < CONTOUR_MIN_ST:
+            return 'contour', None if np.isnan(contour) else round(contour, 2), f'{"+" if sign > 0 else "-"}{CONTOUR_MIN_ST} st or more'
+    return None
+
+
+def load_cache(cache_file):
+    """{path: (mtime_ns, size, {feature: value})} from the columnar .npz cache."""
+    if not os.path.exists(cache_file):
+        return {}
+    with np.load(cache_file, allow_pickle=False) as data:
+        if any(name not in data for name in FEATURES):
+            return {}    # written with another feature set
+        columns = {name: data[name] for name in FEATURES}
+        return {
+            path: (int(mtime), int(size), {name: float(columns[name][i]) for name in FEATURES})
+            for i, (path, mtime, size) in enumerate(zip(data['path'].tolist(), data['mtime_ns'], data['size']))
+        }
+
+
+def save_cache(cache_file, cache):
+    paths = sorted(cache)
+    columns = {
+        'path': np.array(paths, dtype=str),
+        'mtime_ns': np.array([cache[p][0] for p in paths], dtype=np.int64),
+        'size': np.array([cache[p][1] for p in paths], dtype=np.int64),
+    }
+    for name in FEATURES:
+        columns[name] = np.array([cache[p][2][name] for p in paths], dtype=np.float64)
+    tmp = f'{cache_file}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp, cache_file)
+
+
+def run_qc(records, output_dir, workers=None):
+    """Check the generated audio of ledger records against their labels.
+
+    Features of files unchanged since the last run come from <output_dir>/qc_features.npz; the rest
+    are extracted across a process pool. Mismatches go to <output_dir>/qc_report.jsonl.
+    Returns the flagged records.
+    """
+    # augmented variants (noise, reverb, ...) degrade the cues on purpose, so only originals are checked;
+    # the audio is looked up at any fan-out depth, whichever layout the ledger was written with
+    records = [dict(r, path=locate(r['path'])) for r in records if r.get('task') in QC_TASKS and 'augment' not in r]
+    records = [r for r in records if os.path.exists(r['path'])]
+    cache_file = os.path.join(output_dir, 'qc_features.npz')
+    cache = load_cache(cache_file)
+
+    stats = {r['path']: os.stat(r['path']) for r in records}
+    stale = sorted(p for p, st in stats.items() if p not in cache or cache[p][:2] != (st.st_mtime_ns, st.st_size))
+    start = time.time()
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, features in zip(stale, pool.map(extract_features, stale, chunksize=16)):
+                cache[path] = (stats[path].st_mtime_ns, stats[path].st_size, features)
+        save_cache(cache_file, cache)
+    print(f'QC features: {len(stats) - len(stale)} cached, {len(stale)} extracted in {time.time() - start:.1f}s')
+
+    flagged, per_task = [], {}
+    for record in records:
+        result = check(record, cache[record['path']][2])
+        counts = per_task.setdefault(record['task'], [0, 0])
+        counts[0] += 1
+        if result is not None:
+            counts[1] += 1
+            name, measured, expected = result
+            flagged.append({
+                'task': record['task'],
+                'subtask': record.get('subtask'),
+                'label': record.get('label'),
+                'filename': record['filename'],
+                'path': record['path'],
+                'check': name,
+                'measured': measured,
+                'expected': expected,
+            })
+    with open(os.path.join(output_dir, 'qc_report.jsonl'), 'w', encoding='utf-8') as f:
+        for item in flagged:
+            f.write(json.dumps(item) + '\n')
+    for task, (checked, bad) in per_task.items():
+        print(f'QC {task}: {bad}/{checked} samples flagged')
+    return flagged
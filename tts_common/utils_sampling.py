@@ -0,0 +1,58 @@
+import math
+import random
+from itertools import product
+
+
+def nth_permutation(items, k, index):
+    """The index-th k-permutation of items, in itertools.permutations order."""
+    pool = list(items)
+    result = []
+    for i in range(k):
+        j, index = divmod(index, math.perm(len(pool) - 1, k - i - 1))
+        result.append(pool.pop(j))
+    return tuple(result)
+
+
+def sample_permutations(items, k, n, rng=random):
+    """n distinct k-permutations of items in O(n*k*len(items)).
+
+    Draws the same permutations as random.sample(list(permutations(items, k)), n) for the
+    same rng state (random.sample picks indices the same way for a range and a list),
+    without materializing the len(items)!/(len(items)-k)! tuples.
+    """
+    items = list(items)
+    indices = rng.sample(range(math.perm(len(items), k)), n)
+    return [nth_permutation(items, k, index) for index in indices]
+
+
+class ReuseVoiceScheduler:
+    """Voice tuples for repeated dialogues that reuse as few (slot, voice) pairs as possible.
+
+    Each call gets one pool of m voices per slot, with m the smallest size that yields enough
+    tuples of distinct voices, so every utterance of a dialogue is synthesized with at most m
+    voices instead of up to one per rep. Pools are consecutive runs of a shuffled voice list
+    and the start rotates between calls, which spreads usage evenly over all voices.
+    """
+
+    def __init__(self, voices, rng=random, max_grid=10 ** 6):
+        self.voices = list(voices)
+        rng.shuffle(self.voices)
+        self.rng = rng
+        self.max_grid = max_grid
+        self.cursor = 0
+
+    def schedule(self, n_slots, n_reps):
+        """Up to n_reps distinct tuples of n_slots distinct voices."""
+        n = len(self.voices)
+        for m in range(1, n + 1):
+            if m ** n_slots > self.max_grid:
+                # pools this large save little; fall back to uniform sampling
+                total = math.perm(n, n_slots)
+                return sample_permutations(self.voices, n_slots, min(n_reps, total), self.rng)
+            pools = [[self.voices[(self.cursor + s * m + i) % n] for i in range(m)] for s in range(n_slots)]
+            tuples = sorted({t for t in product(*pools) if len(set(t)) == n_slots})
+            if len(tuples) >= n_reps or m == n:
+                break
+        self.cursor = (self.cursor + m * n_slots) % n
+        self.rng.shuffle(tuples)
+        return tuples[:n_reps]